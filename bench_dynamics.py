@@ -0,0 +1,77 @@
+"""
+Scaling benchmark for the dynamics pipeline, so a stage that stops scaling linearly shows up.
+
+    python bench_dynamics.py [--sizes N N ...] [--cfc CLASS] [--report FILE]
+
+For every size a synthetic workbook with two worksheets ('Case 1' and 'Case 2') of N samples each is written,
+then dynamics.main runs on it twice, headless and with profiling on: cold (the workbook is parsed) and warm (the binary cache is read).
+Prints seconds and samples/sec per stage, and optionally writes every run's profile report as one JSON file.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
+import pylightxl as xl
+
+import dynamics
+
+
+def write_workbook(file_name: str, samples: int, seed: int = 0):
+    # an uneven time grid and a noisy crash pulse, like rig data:
+    rng = np.random.default_rng(seed)
+    db = xl.Database()
+    for worksheet in ("Case 1", "Case 2"):
+        times = np.sort(rng.uniform(0, 0.3, samples))
+        accelerations = -40 * np.exp(-((times - 0.1) / 0.01) ** 2) + rng.normal(0, 2, samples)
+        db.add_ws(ws=worksheet)
+        db.ws(worksheet).update_index(row=1, col=1, val="time")
+        db.ws(worksheet).update_index(row=1, col=2, val="acceleration")
+        for row, (time, acceleration) in enumerate(zip(times.tolist(), accelerations.tolist()), start=2):
+            db.ws(worksheet).update_index(row=row, col=1, val=time)
+            db.ws(worksheet).update_index(row=row, col=2, val=acceleration)
+    xl.writexl(db, file_name)
+
+
+def run(workbook: str, folder: str, cfc: int = None):
+    report = os.path.join(folder, "profile.json")
+    argv = ["--workbook", workbook, "--headless", folder, "--profile", report] + (["--cfc", str(cfc)] if cfc else [])
+    # the pipeline's own printout isn't part of the benchmark output:
+    with contextlib.redirect_stdout(io.StringIO()):
+        dynamics.main(argv)
+    with open(report) as file:
+        return json.load(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dynamics pipeline scaling benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000], help="samples per worksheet")
+    parser.add_argument("--cfc", type=int, choices=dynamics.CFC_CLASSES, help="also run the signal-processing stage")
+    parser.add_argument("--report", help="write every run's profile report to this JSON file")
+    args = parser.parse_args()
+
+    runs = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            workbook = os.path.join(folder, "synthetic.xlsx")
+            write_workbook(workbook, size)
+            for cache in ("cold", "warm"):
+                report = run(workbook, folder, args.cfc)
+                runs.append({"samples": size, "cache": cache, **report})
+                print(f"{size:>8} samples, {cache} cache: {report['total_seconds']:8.3f} s")
+                for name, stage in report["stages"].items():
+                    print(
+                        f"    {name:<22} {stage['seconds']:8.4f} s  {stage['samples_per_sec']:>14,.0f} samples/sec"
+                        f"  {stage['peak_memory_bytes'] / 2**20:8.2f} MiB peak"
+                    )
+
+    if args.report:
+        with open(args.report, "w") as file:
+            json.dump(runs, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
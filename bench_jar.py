@@ -0,0 +1,59 @@
+"""
+Contention benchmark for jar.ConcurrentJar and jar.ShardedJar: every thread hammers one shared jar (or pool)
+with try_deposit/try_withdraw pairs. ShardedJar runs use one shard per thread.
+
+    python bench_jar.py [--ops N] [--threads 1 2 4 8]
+"""
+import argparse
+import threading
+from time import perf_counter
+
+from jar import ConcurrentJar, Jar, ShardedJar
+
+
+def hammer(jar, ops: int):
+    deposit, withdraw = jar.try_deposit, jar.try_withdraw
+    for _ in range(ops):
+        if deposit(1):
+            withdraw(1)
+
+
+def run(jar, threads: int, ops: int) -> float:
+    workers = [threading.Thread(target=hammer, args=(jar, ops)) for _ in range(threads)]
+    start = perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * ops / (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ConcurrentJar contention benchmark")
+    parser.add_argument("--ops", type=int, default=100_000, help="deposit/withdraw pairs per thread")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8], help="thread counts to try")
+    args = parser.parse_args()
+
+    # single-threaded baseline, the plain Jar through its properties (it isn't safe to share):
+    jar = Jar(1_000_000)
+    start = perf_counter()
+    for _ in range(args.ops):
+        jar.deposit(1)
+        jar.withdraw(1)
+    print(f"{'Jar':<14} {1:>3} threads  {args.ops / (perf_counter() - start):>12,.0f} pairs/sec")
+
+    for threads in args.threads:
+        jar = ConcurrentJar(threads)
+        rate = run(jar, threads, args.ops)
+        assert jar.size == 0
+        print(f"{'ConcurrentJar':<14} {threads:>3} threads  {rate:>12,.0f} pairs/sec")
+
+    for threads in args.threads:
+        jar = ShardedJar(threads * 4, shards=threads)
+        rate = run(jar, threads, args.ops)
+        assert jar.size == 0
+        print(f"{'ShardedJar':<14} {threads:>3} threads  {rate:>12,.0f} pairs/sec  ({threads} shards)")
+
+
+if __name__ == "__main__":
+    main()
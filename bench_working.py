@@ -0,0 +1,42 @@
+"""
+Micro-benchmark for working.convert: the hand-written scanner (convert) against the regex path (convert_regex),
+in calls/sec, over mixes of valid and invalid inputs.
+
+    python bench_working.py [--calls N] [--repeat N]
+"""
+import argparse
+from random import Random
+from timeit import repeat
+
+from working import convert, convert_regex
+
+VALID = ["9 AM to 5 PM", "10 PM to 8 AM", "9:00 AM to 5:00 PM", "10:30 PM to 8:50 AM", "12 AM to 12 PM"]
+INVALID = ["9:60 AM to 5:60 PM", "9 AM - 5 PM", "09:00 AM - 17:00 PM", "13 AM to 5 PM", "nine to five"]
+
+
+def run(function, inputs):
+    for s in inputs:
+        try:
+            function(s)
+        except ValueError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="working.convert micro-benchmark")
+    parser.add_argument("--calls", type=int, default=100_000, help="calls per mix and path")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mix and path, the fastest one counts")
+    args = parser.parse_args()
+
+    random = Random(0)
+    for share in (1.0, 0.9, 0.5, 0.0):
+        inputs = [random.choice(VALID if random.random() < share else INVALID) for _ in range(args.calls)]
+        rates = {function.__name__: args.calls / min(repeat(lambda: run(function, inputs), number=1, repeat=args.repeat)) for function in (convert, convert_regex)}
+        print(
+            f"{share:>4.0%} valid  scanner: {rates['convert']:>10,.0f} calls/sec  regex: {rates['convert_regex']:>10,.0f} calls/sec"
+            f"  ({rates['convert'] / rates['convert_regex']:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
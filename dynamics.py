@@ -8,8 +8,23 @@ LAST EDITED: SUNDAY APRIL 21, 2024
 JESUS LOVES YOU.
 """
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import numpy as np
 import sys
+import os
+import re
+import csv
+import json
+import hashlib
+import glob
+import argparse
+import contextlib
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from time import perf_counter
 import pylightxl as xl
 
 def open_xl_file(file_name: str = '.xlsx'):
@@ -46,7 +61,146 @@ def read_xl_data(xl_file: xl, worksheet: str, padding:int = 0):
     
     # 3: turn them into numpy vectors and return them
     return np.array(times, dtype = float), np.array(accelerations, dtype = float)
-    
+
+def _to_float(value) -> float:
+    """
+    Converts one Excel cell to float, non-numeric cells (headers, blanks) become NaN.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _file_hash(file_name: str) -> str:
+    """
+    Returns the sha256 hex digest of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as file:
+        while block := file.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_xl_cache(file_name: str = '.xlsx', cache_dir: str = None):
+    """
+    Loads every worksheet of the Excel file as a columnar float array, going through a binary cache.
+    On the first load the workbook is parsed with open_xl_file and each worksheet is saved as a .npy file
+    (one row per Excel column, non-numeric cells as NaN). Later loads memory-map those files instead of parsing the workbook,
+    as long as the workbook's size and mtime (or, failing that, its sha256) still match. Otherwise the cache is rebuilt.
+    If the cache can't be written (e.g. a read-only folder), the parsed worksheets are returned without caching them.
+
+    :param file_name: Excel file name
+    :param cache_dir: folder for the cache, defaults to '<file_name>.cache' next to the workbook
+
+    :return: worksheet name -> columns array, where columns[0] is Excel column 1
+    :rtype: dict of np.arrays
+    """
+    cache_dir = cache_dir or file_name + '.cache'
+    meta_file = os.path.join(cache_dir, 'meta.json')
+
+    # 1: fingerprint the workbook:
+    try:
+        stat = os.stat(file_name)
+    # in case the file is not found in the same folder.
+    except FileNotFoundError:
+        sys.exit("Excel File was not found. Check if it's in the same folder as this Python file.")
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    # 2: try the cache, size and mtime are cheap to check, only hash the workbook if they changed (e.g. the file was copied or touched):
+    try:
+        with open(meta_file) as file:
+            meta = json.load(file)
+        valid = all(meta[key] == value for key, value in fingerprint.items())
+        if not valid and meta['size'] == stat.st_size and meta['sha256'] == _file_hash(file_name):
+            # same contents, just refresh the stored mtime:
+            valid = True
+            meta.update(fingerprint)
+            with open(meta_file, 'w') as file:
+                json.dump(meta, file)
+        if valid:
+            return {worksheet: np.load(os.path.join(cache_dir, npy_file), mmap_mode = 'r') for worksheet, npy_file in meta['worksheets'].items()}
+    except (OSError, KeyError, ValueError):
+        pass  # no cache yet, it's damaged or it can't be read, either way build a fresh one
+
+    # 3: cache miss, parse the workbook:
+    xl_file = open_xl_file(file_name)
+    worksheets = {
+        worksheet: np.array([[_to_float(value) for value in column] for column in xl_file.ws(ws = worksheet).cols], dtype = float)
+        for worksheet in xl_file.ws_names
+    }
+
+    # 4: write one .npy file per worksheet, and the metadata last (and atomically), so a half-written cache is never seen as valid:
+    try:
+        os.makedirs(cache_dir, exist_ok = True)
+        meta = {**fingerprint, 'sha256': _file_hash(file_name), 'worksheets': {}}
+        for index, (worksheet, columns) in enumerate(worksheets.items()):
+            npy_file = f'{index}.npy'
+            np.save(os.path.join(cache_dir, npy_file), columns)
+            meta['worksheets'][worksheet] = npy_file
+        with open(meta_file + '.tmp', 'w') as file:
+            json.dump(meta, file)
+        os.replace(meta_file + '.tmp', meta_file)
+    except OSError:
+        pass  # can't write the cache here, the workbook is just parsed again next time
+
+    return worksheets
+
+def read_cached_data(xl_cache: dict, worksheet: str, padding: int = 0):
+    """
+    Same as read_xl_data, but reads from the arrays returned by load_xl_cache.
+    Like read_xl_data it raises ValueError if a data cell is blank or not a number (e.g. a ragged worksheet),
+    instead of passing the NaN the cache stores for such cells on to the analysis.
+
+    :param xl_cache: worksheet arrays from load_xl_cache
+    :param worksheet: worksheet name
+    :param padding: number of headers or description cells before actual data cells
+
+    :return: times array and accelerations array
+    :rtype: np.arrays
+    """
+    columns = xl_cache[worksheet]
+    times, accelerations = np.asarray(columns[0, padding: ]), np.asarray(columns[1, padding: ])
+    # the cache keeps every worksheet rectangular with NaN, but inside the data range that was a cell float() couldn't read:
+    if np.isnan(times).any() or np.isnan(accelerations).any():
+        raise ValueError(f"worksheet '{worksheet}' has blank or non-numeric cells in the time or acceleration data")
+    return times, accelerations
+
+def read_csv_chunks(file_name: str, padding: int = 0, chunk_size: int = 65536):
+    """
+    Reads 2 column (time, acceleration) data from a CSV export chunk by chunk, so a long recording never has to be in memory at once.
+
+    :param file_name: CSV file name
+    :param padding: number of header or description rows before actual data rows
+    :param chunk_size: number of rows per chunk
+
+    :return: generator of (times, accelerations) chunks
+    :rtype: generator of tuple of np.arrays
+    :raises ValueError: if a non-blank data line has fewer than 2 cells
+    """
+    try:
+        with open(file_name, newline = '') as file:
+            rows = csv.reader(file)
+            # 1: skip header rows:
+            for _ in islice(rows, padding):
+                pass
+            # 2: blank lines (and all-blank rows like ',,' from a spreadsheet export) are skipped,
+            #    a short line is reported by its line number instead of failing as a ragged array:
+            def data_rows():
+                for row in rows:
+                    if not any(cell.strip() for cell in row):
+                        continue
+                    if len(row) < 2:
+                        raise ValueError(f"{file_name}, line {rows.line_num}: expected time and acceleration, got {row}")
+                    yield row[:2]
+            data = data_rows()
+            # 3: keep pulling chunk_size rows until the file runs out:
+            while len(chunk := list(islice(data, chunk_size))) > 0:
+                chunk = np.array(chunk, dtype = float)
+                yield chunk[:, 0], chunk[:, 1]
+    # in case the file is not found in the same folder.
+    except FileNotFoundError:
+        sys.exit("CSV File was not found. Check if it's in the same folder as this Python file.")
+
 def plot_data(x1, y1, x2, y2, title: str = 'Title', x_label: str = 'X Label', y_label: str = 'Y Label', legend1: str = 'Case 1', legend2: str = 'Case 2'):
     # pre-set visual related elements:
     font_size = 10
@@ -71,6 +225,91 @@ def plot_data(x1, y1, x2, y2, title: str = 'Title', x_label: str = 'X Label', y_
     # display graph legend
     plt.legend(prop = {'family': font_type, 'size': font_size, 'weight': 'bold'}, loc = 'lower right')
 
+def decimate_minmax(x: np.array, y: np.array, columns: int = 1280):
+    """
+    Downsamples a long series for drawing by keeping only the min and max y of each pixel column (bucket of samples),
+    plus the first and last point. The drawn line looks the same, but the number of points no longer grows with the sample count.
+
+    :param x: x values, sorted
+    :param y: y values
+    :param columns: number of pixel columns (buckets) to keep a min and max for
+
+    :return: decimated x and y values
+    :rtype: np.arrays
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    n = len(y)
+    # short series are drawn as is:
+    if n <= 2 * columns:
+        return x, y
+
+    # 1: split the indices into equal buckets, the last bucket is padded by repeating the last index:
+    bucket = -(-n // columns)  # ceiling division
+    indices = np.minimum(np.arange(columns * bucket), n - 1).reshape(columns, bucket)
+    rows = np.arange(columns)
+
+    # 2: position of the min and max inside each bucket:
+    values = y[indices]
+    lows = indices[rows, values.argmin(axis = 1)]
+    highs = indices[rows, values.argmax(axis = 1)]
+
+    # 3: keep them (and both end points) in their original order:
+    keep = np.unique(np.concatenate(([0, n - 1], lows, highs)))
+    return x[keep], y[keep]
+
+class HeadlessPlotter:
+    """
+    Non-interactive replacement for plot_data. Draws on one reused figure and axes through the Agg (non-GUI) backend,
+    decimates long series before drawing and writes every chart straight to a PNG or SVG file.
+    """
+    # pre-set visual related elements, same as plot_data:
+    font_size = 10
+    font_type = 'Arial'
+    line_width = 2
+
+    def __init__(self, output_dir: str = '.', file_format: str = 'png', width: int = 1280, height: int = 720, dpi: int = 100):
+        if file_format not in ('png', 'svg'):
+            raise ValueError("file_format must be 'png' or 'svg'")
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.columns = width
+        os.makedirs(output_dir, exist_ok = True)
+
+        # one figure and axes, built without pyplot so no GUI backend is ever loaded:
+        self.figure = Figure(figsize = (width / dpi, height / dpi), dpi = dpi)
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        # the two lines are created once and only get new data for every chart:
+        self.line1, = self.axes.plot([], [], color = 'lightcoral', linewidth = self.line_width)
+        self.line2, = self.axes.plot([], [], color = 'cornflowerblue', linewidth = self.line_width)
+        self.axes.grid(True)
+
+    def plot(self, x1, y1, x2, y2, title: str = 'Title', x_label: str = 'X Label', y_label: str = 'Y Label', legend1: str = 'Case 1', legend2: str = 'Case 2'):
+        """
+        Same arguments as plot_data. Saves the chart as '<title>.<file_format>' in output_dir.
+
+        :return: path of the written file
+        :rtype: str
+        """
+        # 1: swap in the (decimated) data:
+        self.line1.set_data(*decimate_minmax(x1, y1, self.columns))
+        self.line2.set_data(*decimate_minmax(x2, y2, self.columns))
+        self.line1.set_label(legend1)
+        self.line2.set_label(legend2)
+        self.axes.relim()
+        self.axes.autoscale_view()
+
+        # 2: title, x & y axis labels, legend:
+        self.axes.set_title(title, fontfamily = self.font_type, fontsize = self.font_size * 2, fontweight = 'bold')
+        self.axes.set_xlabel(x_label, fontfamily = self.font_type, fontsize = self.font_size, fontweight = 'bold')
+        self.axes.set_ylabel(y_label, fontfamily = self.font_type, fontsize = self.font_size, fontweight = 'bold')
+        self.axes.legend(prop = {'family': self.font_type, 'size': self.font_size, 'weight': 'bold'}, loc = 'lower right')
+
+        # 3: write the file, named after the title:
+        file_name = os.path.join(self.output_dir, re.sub(r'[^\w\-]+', '_', title).strip('_') + '.' + self.file_format)
+        self.figure.savefig(file_name, format = self.file_format)
+        return file_name
+
 def numerical_integration(x: np.array, fx: np.array, initial_value: float = 0.0):
     """
     Performs numerical integration using trapzeoidal integration function. 
@@ -107,24 +346,631 @@ def numerical_integration(x: np.array, fx: np.array, initial_value: float = 0.0)
     # return the newly integrated data points:
     return areas, total_area
 
-def main():
+def cumulative_integration(x: np.array, fx: np.array, initial_value = 0.0, axis: int = -1):
+    """
+    Vectorized version of numerical_integration. Computes the whole running trapezoid sum in one array pass,
+    so it also works on 2D data where each row (or column) is a separate channel or trial.
+
+    :param x: sample points, either 1D (shared by every channel) or the same shape as fx
+    :param fx: function values, 1D or 2D
+    :param initial_value: starting value of the integral, a scalar or one value per channel
+    :param axis: axis of fx to integrate along
+
+    :return: integrated data points (same shape as fx) and total area (float for 1D, one per channel for 2D)
+    :rtype: np.array, float or np.array
+    """
+    # 1: move the integration axis to the end so every case looks the same:
+    fx = np.moveaxis(np.asarray(fx, dtype = float), axis, -1)
+    x = np.asarray(x, dtype = float)
+    if x.ndim > 1:
+        x = np.moveaxis(x, axis, -1)
+
+    # error checking:
+    if x.shape[-1] != fx.shape[-1]:
+        sys.exit("ERROR: x and y vectors are not the same length.")
+
+    # 2: first slot holds the initial value, the rest hold every incremental trapezoid area:
+    # formula for trapezoid area is: width / 2 * (height1 + height2)
+    areas = np.empty(fx.shape, dtype = float)
+    areas[..., 0] = initial_value
+    areas[..., 1:] = 0.5 * np.diff(x, axis = -1) * (fx[..., 1:] + fx[..., :-1])
+
+    # 3: running total of the areas, d(n) = A1 + A2 + ... + An, done in place:
+    np.cumsum(areas, axis = -1, out = areas)
+    total_area = areas[..., -1]
+
+    # return the integrated data points with the original axis order:
+    return np.moveaxis(areas, -1, axis), (float(total_area) if fx.ndim == 1 else total_area)
+
+def stream_integration(chunks, initial_value: float = 0.0):
+    """
+    Streaming version of numerical_integration. Takes (x, fx) chunks one at a time and yields (x, integrated values) chunks,
+    carrying the running area and the last sample across chunk boundaries, so memory stays at one chunk no matter how long the recording is.
+
+    Since it yields the same (x, values) pairs it takes, passes can be chained:
+        velocities    = stream_integration(read_csv_chunks(...), initial_value = v0)
+        displacements = stream_integration(velocities, initial_value = d0)
+
+    :param chunks: iterable of (x, fx) array pairs, in order
+    :param initial_value: starting value of the integral
+
+    :return: generator of (x, areas) chunks
+    :rtype: generator of tuple of np.arrays
+    """
+    # running total and the last sample of the previous chunk (none before the first chunk):
+    total_area = initial_value
+    last_x = last_fx = None
+
+    for x, fx in chunks:
+        x, fx = np.asarray(x, dtype = float), np.asarray(fx, dtype = float)
+        # error checking:
+        if len(x) != len(fx):
+            sys.exit("ERROR: x and y vectors are not the same length.")
+        if len(x) == 0:
+            continue
+
+        if last_x is None:
+            # 1: first chunk, integrate it as is:
+            areas, total_area = cumulative_integration(x, fx, initial_value = total_area)
+        else:
+            # 2: later chunks, glue the previous last sample on the front so the trapezoid across the boundary is counted:
+            areas, total_area = cumulative_integration(np.concatenate(([last_x], x)), np.concatenate(([last_fx], fx)), initial_value = total_area)
+            areas = areas[1:]
+
+        # 3: remember the boundary sample for the next chunk:
+        last_x, last_fx = x[-1], fx[-1]
+        yield x, areas
+
+# SAE J211 channel frequency classes, CFC 60 is the usual one for vehicle (whole-body) acceleration:
+CFC_CLASSES = (60, 180, 600, 1000)
+
+def resample_uniform(times: np.array, values: np.array, sample_rate: float = None):
+    """
+    Puts unevenly sampled data on a uniform time grid with linear interpolation.
+    Rows with a NaN (blank cells) are dropped, samples are sorted by time and repeated time stamps keep their first value.
+
+    :param times: time values
+    :param values: sampled values (e.g. accelerations)
+    :param sample_rate: samples per second of the new grid, defaults to the median sample rate of the input
+
+    :return: uniform times, resampled values and the sample rate used
+    :rtype: np.array, np.array, float
+    """
+    times, values = np.asarray(times, dtype = float), np.asarray(values, dtype = float)
+    # error checking:
+    if len(times) != len(values):
+        sys.exit("ERROR: x and y vectors are not the same length.")
+
+    # 1: drop blank rows, sort by time and drop repeated time stamps:
+    keep = ~(np.isnan(times) | np.isnan(values))
+    times, values = times[keep], values[keep]
+    order = np.argsort(times, kind = 'stable')
+    times, values = times[order], values[order]
+    first = np.concatenate(([True], np.diff(times) > 0))
+    times, values = times[first], values[first]
+    if len(times) < 2:
+        raise ValueError("need at least 2 samples to resample")
+
+    # 2: the new grid, from the first sample to (at most) the last one:
+    if sample_rate is None:
+        sample_rate = 1 / np.median(np.diff(times))
+    count = int(np.floor((times[-1] - times[0]) * sample_rate + 1e-9)) + 1
+    grid = times[0] + np.arange(count) / sample_rate
+
+    # 3: linear interpolation onto the grid, all in one array pass:
+    return grid, np.interp(grid, times, values), float(sample_rate)
+
+def cfc_coefficients(cfc: int, sample_rate: float):
+    """
+    Coefficients of the SAE J211 2-pole Butterworth low-pass filter for one channel frequency class:
+        y[n] = a0 x[n] + a1 x[n-1] + a2 x[n-2] + b1 y[n-1] + b2 y[n-2]
+    Run forward and then backward over the data it's the phaseless 4-pole CFC filter.
+
+    :param cfc: channel frequency class (e.g. 60), the filter's -3 dB point is at 1.65 * cfc Hz
+    :param sample_rate: samples per second
+
+    :return: a0, a1, a2, b1, b2
+    :rtype: tuple of 5 float
+    """
+    # the design frequency has to be below Nyquist, or the pre-warping below blows up:
+    wd = 2 * np.pi * cfc * 2.0775
+    if not 0 < wd / sample_rate < np.pi:
+        raise ValueError(f"sample rate {sample_rate} Hz is too low for CFC {cfc}")
+    wa = np.tan(wd / sample_rate / 2)
+    denominator = 1 + np.sqrt(2) * wa + wa ** 2
+    a0 = wa ** 2 / denominator
+    b1 = -2 * (wa ** 2 - 1) / denominator
+    b2 = (-1 + np.sqrt(2) * wa - wa ** 2) / denominator
+    return a0, 2 * a0, a0, b1, b2
+
+@lru_cache(maxsize = 32)
+def _cfc_kernel(cfc: int, sample_rate: float, tolerance: float = 1e-10):
+    """
+    Impulse response of the forward + backward CFC filter, cut off once it has died down below tolerance of its peak.
+    Only depends on the filter, not on the data, so it's computed once per (cfc, sample_rate).
+    """
+    a0, a1, a2, b1, b2 = cfc_coefficients(cfc, sample_rate)
+    # 1: impulse response of one pass, the recursion runs once here instead of once per sample of every trace:
+    response = []
+    x1 = x2 = y1 = y2 = 0.0
+    x, peak = 1.0, 0.0
+    for _ in range(1_000_000):
+        y = a0 * x + a1 * x1 + a2 * x2 + b1 * y1 + b2 * y2
+        response.append(y)
+        x2, x1, x = x1, x, 0.0
+        y2, y1 = y1, y
+        peak = max(peak, abs(y))
+        if abs(y1) < tolerance * peak and abs(y2) < tolerance * peak:
+            break
+    response = np.array(response)
+
+    # 2: forward then backward is the same as convolving with the response and its mirror image (symmetric, so no phase shift):
+    kernel = np.convolve(response, response[::-1])
+    # unity gain at DC, so a constant acceleration stays exactly the same:
+    return kernel / kernel.sum()
+
+def cfc_filter(values: np.array, sample_rate: float, cfc: int = 60):
+    """
+    Phaseless SAE J211 CFC low-pass filter of uniformly sampled data (see resample_uniform).
+    Instead of running the filter recursion sample by sample, the data is convolved with the filter's (cached) impulse response
+    through the FFT, so the cost is a few array passes whatever the trace length. Both ends are padded with an odd reflection
+    of the data, so the filter doesn't pull the first and last samples towards 0.
+
+    :param values: uniformly sampled values
+    :param sample_rate: samples per second
+    :param cfc: channel frequency class, one of CFC_CLASSES
+
+    :return: filtered values
+    :rtype: np.array
+    """
+    values = np.asarray(values, dtype = float)
+    if len(values) < 2:
+        return values.copy()
+    kernel = _cfc_kernel(cfc, float(sample_rate))
+
+    # 1: pad both ends by half a kernel:
+    half = len(kernel) // 2
+    padded = np.pad(values, half, mode = 'reflect', reflect_type = 'odd')
+
+    # 2: FFT convolution, the smallest power of 2 that fits the full convolution:
+    size = len(padded) + len(kernel) - 1
+    fft_size = 1 << (size - 1).bit_length()
+    full = np.fft.irfft(np.fft.rfft(padded, fft_size) * np.fft.rfft(kernel, fft_size), fft_size)
+
+    # 3: only keep the part lined up with the original samples:
+    return full[len(kernel) - 1: len(padded)]
+
+def condition_signal(times: np.array, accelerations: np.array, sample_rate: float = None, cfc: int = 60):
+    """
+    Signal-processing stage between reading and integration: resample_uniform, then cfc_filter.
+    The cleaned times and accelerations go straight into cumulative_integration.
+
+    :param times: time values, may be uneven or unsorted
+    :param accelerations: acceleration values
+    :param sample_rate: samples per second of the uniform grid, defaults to the median sample rate of the input
+    :param cfc: channel frequency class, or None to only resample
+
+    :return: uniform times and cleaned accelerations
+    :rtype: np.arrays
+    """
+    times, accelerations, sample_rate = resample_uniform(times, accelerations, sample_rate)
+    if cfc:
+        accelerations = cfc_filter(accelerations, sample_rate, cfc)
+    return times, accelerations
+
+def peak_deceleration(times: np.array, accelerations: np.array):
+    """
+    Finds the peak deceleration (the most negative acceleration) of a trace.
+
+    :return: time of the peak, peak deceleration (a positive number) and its index
+    :rtype: float, float, int
+    """
+    index = int(np.argmin(accelerations))
+    return float(times[index]), float(-accelerations[index]), index
+
+def impact_windows(accelerations: np.array, fraction: float = 0.1):
+    """
+    Finds the impact windows: every stretch of samples where the deceleration is at least fraction of the peak deceleration.
+
+    :param accelerations: acceleration values
+    :param fraction: threshold, as a fraction of the peak deceleration
+
+    :return: one [start, end) index pair per window, in time order, so accelerations[start:end] is the window
+    :rtype: np.array of shape (windows, 2)
+    """
+    decelerations = -np.asarray(accelerations, dtype = float)
+    if len(decelerations) == 0 or not decelerations.max() > 0:
+        return np.empty((0, 2), dtype = int)
+
+    # 1: which samples are over the threshold, with a False on both ends so every window has a start and an end:
+    above = np.concatenate(([False], decelerations >= fraction * decelerations.max(), [False]))
+    # 2: a window starts where above goes False -> True and ends where it goes True -> False:
+    edges = np.flatnonzero(above[1:] != above[:-1])
+    return edges.reshape(-1, 2)
+
+class ImpulseIndex:
+    """
+    Answers "what's the impulse between t0 and t1?" for any window without integrating the force series again.
+    The running trapezoid integral (the prefix) is computed once, then every query is a binary search for the window edges
+    plus an interpolated partial trapezoid at each edge, O(log n) per window. Queries take scalars or whole arrays of windows.
+
+    Outside the recorded time span the force counts as 0, so windows may stick out of the data.
+    Repeated time stamps are fine (they're zero-width intervals). The total works on any data, like cumulative_integration,
+    but window queries need at least 2 samples in non-decreasing time order (see ordered).
+    """
+    def __init__(self, times: np.array, forces: np.array):
+        """
+        :param times: time values, non-decreasing for window queries
+        :param forces: force values
+        """
+        self.times = np.asarray(times, dtype = float)
+        self.forces = np.asarray(forces, dtype = float)
+        # error checking:
+        if len(self.times) != len(self.forces):
+            sys.exit("ERROR: x and y vectors are not the same length.")
+        # whether windows can be looked up, the binary search needs sorted times:
+        self.ordered = len(self.times) >= 2 and not np.any(np.diff(self.times) < 0)
+        # prefix[i] = impulse from times[0] to times[i]:
+        self.prefix, self.total = cumulative_integration(self.times, self.forces)
+
+    def integral(self, t):
+        """
+        Impulse from the first sample to time t.
+
+        :param t: a time or an array of times
+
+        :return: impulse up to each t
+        :rtype: float or np.array
+        """
+        if not self.ordered:
+            raise ValueError("window queries need at least 2 samples with non-decreasing times")
+        t = np.clip(np.asarray(t, dtype = float), self.times[0], self.times[-1])
+        # 1: sample interval each t falls into, times[i] <= t <= times[i + 1] (the last of any repeated time stamps):
+        i = np.clip(np.searchsorted(self.times, t, side = 'right') - 1, 0, len(self.times) - 2)
+        # 2: force at t, interpolated along that interval (a zero-width interval only happens at the very end, where width is 0 too):
+        width = t - self.times[i]
+        span = self.times[i + 1] - self.times[i]
+        fraction = np.divide(width, span, out = np.zeros_like(width), where = span > 0)
+        force = self.forces[i] + (self.forces[i + 1] - self.forces[i]) * fraction
+        # 3: whole intervals from the prefix, plus the partial trapezoid up to t:
+        result = self.prefix[i] + 0.5 * width * (self.forces[i] + force)
+        return float(result) if result.ndim == 0 else result
+
+    def impulse(self, t0, t1):
+        """
+        Impulse over the window [t0, t1], the area under Force VS Time between them.
+
+        :param t0: window start, a time or an array of times
+        :param t1: window end, a time or an array of times (same shape as t0)
+
+        :return: impulse of each window
+        :rtype: float or np.array
+        """
+        return self.integral(t1) - self.integral(t0)
+
+    def sliding(self, width: float, starts: np.array = None):
+        """
+        Impulse of a window of the given width sliding along the data, every window in one vectorized query.
+
+        :param width: window length, in seconds
+        :param starts: window start times, defaults to every sample time
+
+        :return: window start times and the impulse of each window
+        :rtype: np.arrays
+        """
+        starts = self.times if starts is None else np.asarray(starts, dtype = float)
+        return starts, self.impulse(starts, starts + width)
+
+    def peak(self, width: float, starts: np.array = None):
+        """
+        Window of the given width with the largest impulse (in magnitude, so the hardest braking when forces are negative).
+
+        :return: start time of that window and its impulse
+        :rtype: float, float
+        """
+        starts, impulses = self.sliding(width, starts)
+        index = int(np.argmax(np.abs(impulses)))
+        return float(starts[index]), float(impulses[index])
+
+# environment variable that turns profiling on, set it to the JSON report's file name (same as --profile):
+PROFILE_ENV = 'DYNAMICS_PROFILE'
+
+class StageProfiler:
+    """
+    Opt-in per-stage instrumentation for the analysis pipeline: wall time, samples processed, samples/sec and peak memory of every stage,
+    summed over all calls of the same stage and written out as a JSON report.
+
+        profiler = StageProfiler(enabled = True)
+        with profiler.stage('read_xl_data') as stage:
+            times, accelerations = read_cached_data(...)
+            stage['samples'] = len(times)
+        profiler.write('profile.json')
+
+    When it's disabled, stage() hands back one shared do-nothing context, so the instrumented code costs a method call per stage and nothing else.
+    Peak memory is measured with tracemalloc (numpy reports its arrays to it), as the most the stage allocated above what it started with.
+    Stages must not be nested, each one resets the tracemalloc peak.
+    """
+    _DISABLED = contextlib.nullcontext({})
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        # stage name -> totals, in the order the stages first ran:
+        self.stages = {}
+        # only stop tracemalloc later if this profiler is the one that started it:
+        self._tracing = enabled and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+
+    def stop(self):
+        """
+        Turns memory tracing back off (it slows every allocation down while it's on), the totals so far are kept.
+        """
+        self.enabled = False
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def stage(self, name: str, samples: int = 0):
+        """
+        Context manager timing one run of a stage. It gives a dict whose 'samples' can be set once the stage knows how many it processed.
+
+        :param name: stage name, runs with the same name are added up
+        :param samples: number of samples processed, if already known
+        """
+        if not self.enabled:
+            return self._DISABLED
+        return self._measure(name, samples)
+
+    @contextlib.contextmanager
+    def _measure(self, name: str, samples: int):
+        record = {'samples': samples}
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        start = perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = perf_counter() - start
+            peak_memory = tracemalloc.get_traced_memory()[1] - memory_before
+            self.add(name, {'calls': 1, 'seconds': seconds, 'samples': record['samples'], 'peak_memory_bytes': peak_memory})
+
+    def add(self, name: str, totals: dict):
+        """
+        Adds the totals of one (or several, e.g. from a worker process's profiler) runs of a stage.
+        Calls, seconds and samples are summed, peak memory is the largest of them.
+        """
+        stage = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'samples': 0, 'peak_memory_bytes': 0})
+        for key in ('calls', 'seconds', 'samples'):
+            stage[key] += totals[key]
+        stage['peak_memory_bytes'] = max(stage['peak_memory_bytes'], totals['peak_memory_bytes'])
+
+    def report(self):
+        """
+        :return: machine-readable report, {'stages': {name: totals with samples_per_sec}, 'total_seconds': ...}
+        :rtype: dict
+        """
+        stages = {
+            name: {**totals, 'samples_per_sec': totals['samples'] / totals['seconds'] if totals['seconds'] else 0.0}
+            for name, totals in self.stages.items()
+        }
+        return {'stages': stages, 'total_seconds': sum(totals['seconds'] for totals in self.stages.values())}
+
+    def write(self, file_name: str):
+        """
+        Writes the report as JSON, '-' writes it to stderr.
+        """
+        if file_name == '-':
+            json.dump(self.report(), sys.stderr, indent = 2)
+            print(file = sys.stderr)
+        else:
+            with open(file_name, 'w') as file:
+                json.dump(self.report(), file, indent = 2)
+
+def _profile_target(option: str = None):
+    """
+    Where the profile report goes: the --profile option if given, otherwise the environment variable, otherwise None (profiling off).
+    """
+    return option or os.environ.get(PROFILE_ENV) or None
+
+BATCH_FIELDS = ['workbook', 'worksheet', 'mass', 'v0', 'padding', 'cfc', 'samples', 'p0', 'pf', 'impulse', 'error']
+
+def analyze_case(times: np.array, accelerations: np.array, mass: float, v0: float, cfc: int = None):
+    """
+    Runs the (condition ->) integrate -> momentum/impulse part of main on one case.
+
+    :param times: time values
+    :param accelerations: acceleration values
+    :param mass: mass of the vehicle
+    :param v0: initial velocity
+    :param cfc: if given, the trace is resampled and CFC filtered first (see condition_signal)
+
+    :return: momentum before impact, momentum after impact, total impulse
+    :rtype: tuple of 3 float
+    """
+    if cfc:
+        times, accelerations = condition_signal(times, accelerations, cfc = cfc)
+    # velocity from acceleration, starting at v0:
+    _, final_velocity = cumulative_integration(times, accelerations, initial_value = v0)
+    # total impulse is the area under the curve of Force VS Time:
+    _, impulse = cumulative_integration(times, mass * accelerations)
+    return mass * v0, mass * final_velocity, impulse
+
+def analyze_workbook(file_name: str, cases: list, profiler: StageProfiler = None):
+    """
+    Runs every case of one workbook. Meant to run on a worker process, so errors are caught and reported per case instead of exiting.
+
+    :param file_name: Excel file name
+    :param cases: list of dicts with 'worksheet', 'mass', 'v0', 'padding' and (optional) 'cfc'
+    :param profiler: times the open_xl_file, read_xl_data, condition_signal and analyze_case stages, if given and enabled
+
+    :return: one result row (see BATCH_FIELDS) per case, 'samples' counts the samples integrated (after resampling if 'cfc' is set)
+    :rtype: list of dict
+    """
+    results = []
+    profiler = profiler or StageProfiler()
+    # the workbook is read once and shared by all of its cases:
+    try:
+        with profiler.stage('open_xl_file') as stage:
+            xl_cache = load_xl_cache(file_name)
+            stage['samples'] = sum(columns.shape[-1] for columns in xl_cache.values())
+    # a missing, unreadable or corrupt (not a zip) workbook only fails its own rows, not the whole batch:
+    except SystemExit as error:
+        return [{'workbook': file_name, **case, 'error': str(error)} for case in cases]
+    except Exception as error:
+        return [{'workbook': file_name, **case, 'error': f'{type(error).__name__}: {error}'} for case in cases]
+
+    for case in cases:
+        row = {'workbook': file_name, **case}
+        try:
+            with profiler.stage('read_xl_data') as stage:
+                times, accelerations = read_cached_data(xl_cache, case['worksheet'], case['padding'])
+                stage['samples'] = len(times)
+            # an unattended run must not report numbers from bad data (or a bad case table) as a success:
+            if not (np.isfinite(times).all() and np.isfinite(accelerations).all()):
+                raise ValueError('time or acceleration data has non-finite values')
+            # conditioned here rather than in analyze_case, so 'samples' is the count that actually gets integrated:
+            if case.get('cfc'):
+                with profiler.stage('condition_signal', len(times)):
+                    times, accelerations = condition_signal(times, accelerations, cfc = case['cfc'])
+            row['samples'] = len(times)
+            # overflow is checked for below, so numpy doesn't need to warn about it:
+            with profiler.stage('analyze_case', len(times)), np.errstate(over = 'ignore', invalid = 'ignore'):
+                values = analyze_case(times, accelerations, case['mass'], case['v0'])
+            if not np.isfinite(values).all():
+                raise ValueError('analysis gave non-finite momentum or impulse, check mass, v0 and the data')
+            row['p0'], row['pf'], row['impulse'] = values
+        except KeyError:
+            row['error'] = f"worksheet '{case['worksheet']}' not found"
+        except (IndexError, ValueError, SystemExit) as error:
+            row['error'] = str(error)
+        results.append(row)
+    return results
+
+def _analyze_workbook_job(job: tuple):
+    # ProcessPoolExecutor.map only passes one argument, unpack it here.
+    # the worker profiles into its own profiler, and sends back the stage totals along with the results:
+    file_name, cases, profile = job
+    profiler = StageProfiler(profile)
+    results = analyze_workbook(file_name, cases, profiler)
+    profiler.stop()
+    return results, profiler.stages
+
+def read_case_table(file_name: str):
+    """
+    Reads the per-case parameter table, a CSV with columns worksheet, mass, v0 and (optional) padding, cfc and workbook.
+    An empty cfc means the raw trace is integrated.
+    Rows with an empty workbook apply to every workbook, otherwise only to the workbook with that file name.
+
+    :param file_name: CSV file name
+
+    :return: list of case dicts
+    :rtype: list of dict
+    """
+    try:
+        with open(file_name, newline = '') as file:
+            return [
+                {
+                    'workbook': row.get('workbook') or '',
+                    'worksheet': row['worksheet'],
+                    'mass': float(row['mass']),
+                    'v0': float(row['v0']),
+                    'padding': int(row.get('padding') or 0),
+                    'cfc': int(row.get('cfc') or 0) or None,
+                }
+                for row in csv.DictReader(file)
+            ]
+    # in case the file is not found in the same folder.
+    except FileNotFoundError:
+        sys.exit("Case table was not found. Check if it's in the same folder as this Python file.")
+    # in case a required column is missing or a number doesn't parse:
+    except (KeyError, ValueError):
+        sys.exit("Case table must have worksheet, mass and v0 columns with numeric mass and v0 (and a whole number cfc).")
+
+def run_batch(workbooks: str, cases: list, output_file: str, workers: int = None, profiler: StageProfiler = None):
+    """
+    Runs the read -> integrate -> momentum/impulse pipeline over every case of every workbook on a process pool
+    (one task per workbook, so each workbook is parsed once), and writes one consolidated CSV table in workbook order.
+
+    :param workbooks: a folder of .xlsx files or a glob pattern
+    :param cases: case dicts, as returned by read_case_table
+    :param output_file: CSV file to write the results table to
+    :param workers: number of worker processes, defaults to the number of cores
+    :param profiler: if given, the workers profile their stages and the totals are added to it (stage seconds are summed over workers, not wall time)
+
+    :return: number of result rows written
+    :rtype: int
+    """
+    # 1: find every workbook:
+    pattern = os.path.join(workbooks, '*.xlsx') if os.path.isdir(workbooks) else workbooks
+    file_names = sorted(glob.glob(pattern))
+
+    # 2: match cases to workbooks, a case without a workbook applies to all of them:
+    jobs = []
+    for file_name in file_names:
+        workbook_cases = [
+            {key: value for key, value in case.items() if key != 'workbook'}
+            for case in cases
+            if case['workbook'] in ('', os.path.basename(file_name))
+        ]
+        if workbook_cases:
+            jobs.append((file_name, workbook_cases, profiler is not None))
+
+    # 3: fan out to the pool, map keeps the workbook order, and write rows as they come back:
+    rows = 0
+    with open(output_file, 'w', newline = '') as file, ProcessPoolExecutor(max_workers = workers) as executor:
+        writer = csv.DictWriter(file, fieldnames = BATCH_FIELDS)
+        writer.writeheader()
+        for results, stages in executor.map(_analyze_workbook_job, jobs):
+            writer.writerows(results)
+            rows += len(results)
+            for name, totals in stages.items():
+                profiler.add(name, totals)
+    return rows
+
+def main(argv: list = None):
+    # command-line options, by default the charts are shown interactively:
+    parser = argparse.ArgumentParser(prog = 'dynamics.py', description = 'Vehicle crash data analysis.')
+    parser.add_argument('--headless', metavar = 'DIR', help = 'write the charts to DIR through a non-GUI backend instead of showing them')
+    parser.add_argument('--format', choices = ['png', 'svg'], default = 'png', help = 'file format of the charts in headless mode')
+    parser.add_argument('--cfc', type = int, choices = CFC_CLASSES, help = 'resample and low-pass filter the traces with this SAE J211 channel class before integrating')
+    parser.add_argument('--rate', type = float, metavar = 'HZ', help = 'resample the traces onto a uniform grid at this rate, on its own or before --cfc (default with --cfc: median rate of the data)')
+    parser.add_argument('--workbook', default = 'Dynamics Crash Data.xlsx', help = 'Excel file with the Case 1 and Case 2 worksheets')
+    parser.add_argument('--profile', metavar = 'FILE', help = f'write per-stage timing and memory as JSON to FILE (- for stderr), same as setting {PROFILE_ENV}')
+    args = parser.parse_args(argv)
+    # per-stage instrumentation, off unless asked for:
+    profile = _profile_target(args.profile)
+    profiler = StageProfiler(enabled = profile is not None)
+    # headless mode draws every chart on one reused figure and saves it, otherwise each chart gets its own pyplot window:
+    plot = HeadlessPlotter(args.headless, args.format).plot if args.headless else plot_data
+
     ######################## START: EXCEL DATA IMPORT ########################
     # NOTE: Your Excel file must have BOTH case 1 and case 2 data, in two separate sheets. 
-    # open the Excel file:
-    xl_file = open_xl_file(file_name = 'Dynamics Crash Data.xlsx')
+    # open the Excel file (through the binary cache, so the workbook is only parsed when it changes):
+    with profiler.stage('open_xl_file') as stage:
+        xl_cache = load_xl_cache(file_name = args.workbook)
+        stage['samples'] = sum(columns.shape[-1] for columns in xl_cache.values())
 
     mass = 0.4 # mass of the vehicle
     v0_1 = 1.8 # initial velocity for Case 1
     v0_2 = 1.6 # initial velocity for Case 2
     
-    # collect time and acceleration values for CASE 1:
-    times_1, accelerations_1 = read_xl_data(xl_file, worksheet = 'Case 1', padding = 1)
-    # collect time and acceleration values for CASE 2:
-    times_2, accelerations_2 = read_xl_data(xl_file, worksheet = 'Case 2', padding = 1)
+    with profiler.stage('read_xl_data') as stage:
+        # collect time and acceleration values for CASE 1:
+        times_1, accelerations_1 = read_cached_data(xl_cache, worksheet = 'Case 1', padding = 1)
+        # collect time and acceleration values for CASE 2:
+        times_2, accelerations_2 = read_cached_data(xl_cache, worksheet = 'Case 2', padding = 1)
+        stage['samples'] = len(times_1) + len(times_2)
+
+    # clean up noisy, unevenly sampled rig data before anything is integrated (--rate alone only resamples):
+    if args.cfc or args.rate:
+        with profiler.stage('condition_signal', len(times_1) + len(times_2)):
+            times_1, accelerations_1 = condition_signal(times_1, accelerations_1, args.rate, args.cfc)
+            times_2, accelerations_2 = condition_signal(times_2, accelerations_2, args.rate, args.cfc)
 
     # use numerical integration to get velocity data
-    velocities_1, _ = numerical_integration(times_1, accelerations_1, initial_value = v0_1)
-    velocities_2, _ = numerical_integration(times_2, accelerations_2, initial_value = v0_2)
+    with profiler.stage('numerical_integration', len(times_1) + len(times_2)):
+        velocities_1, _ = cumulative_integration(times_1, accelerations_1, initial_value = v0_1)
+        velocities_2, _ = cumulative_integration(times_2, accelerations_2, initial_value = v0_2)
 
     # and go ahead just calculate the forces as well:
     forces_1 = mass * accelerations_1
@@ -133,14 +979,19 @@ def main():
 
 
     ######################## START: KINEMATIC ANALYSIS ########################
+    # every chart draws both cases:
+    plotted = len(times_1) + len(times_2)
     # TODO 1: the acceleration of the vehicle vs. time – plot both cases separately and then on the same set of axes
-    plot_data(times_1, accelerations_1, times_2, accelerations_2, "ACCELERATION of the vehicle VS TIME", 'Time ($s$)', 'Acceleration ($m/s^2$)', 'Case 1', 'Case 2')
+    with profiler.stage('plot_data', plotted):
+        plot(times_1, accelerations_1, times_2, accelerations_2, "ACCELERATION of the vehicle VS TIME", 'Time ($s$)', 'Acceleration ($m/s^2$)', 'Case 1', 'Case 2')
 
     # TODO 2: the force exerted on the vehicle vs. time – plot both cases separately and then on the same set of axes
-    plot_data(times_1, forces_1, times_2, forces_2, "FORCE Exerted on the vehicle VS TIME", 'Time ($s$)', 'Force ($Newtons$)', 'Case 1', 'Case 2')
+    with profiler.stage('plot_data', plotted):
+        plot(times_1, forces_1, times_2, forces_2, "FORCE Exerted on the vehicle VS TIME", 'Time ($s$)', 'Force ($Newtons$)', 'Case 1', 'Case 2')
 
     # TODO 3: the velocity of the vehicle vs. time for both case
-    plot_data(times_1, velocities_1, times_2, velocities_2, "VELOCITY of the vehicle VS TIME", 'Time ($s$)', 'Velocity ($m/s$)', 'Case 1', 'Case 2')
+    with profiler.stage('plot_data', plotted):
+        plot(times_1, velocities_1, times_2, velocities_2, "VELOCITY of the vehicle VS TIME", 'Time ($s$)', 'Velocity ($m/s$)', 'Case 1', 'Case 2')
     ######################## END: KINEMATIC ANALYSIS ########################
     
 
@@ -157,17 +1008,59 @@ def main():
     # TODO 3: Determine the total impulse imparted on the vehicle as a result of the collision for both cases 
             # – you should use the numerical integration algorithm discussed in class.
     # total impulse is the area under the curve of Force VS Time
-    _ , impulse_1 = numerical_integration(times_1, forces_1, forces_1[0]) # FIXME
-    _ , impulse_2 = numerical_integration(times_2, forces_2, forces_2[0]) # FIXME
+    # the prefix integral is built once per case, then any window (like the impact window below) is just a lookup:
+    with profiler.stage('impulse', len(times_1) + len(times_2)):
+        impulses_1 = ImpulseIndex(times_1, forces_1)
+        impulses_2 = ImpulseIndex(times_2, forces_2)
+    # the integral starts at 0 N-s (adding the first force sample, in N, to an impulse mixed up units), same as analyze_case:
+    impulse_1 = impulses_1.total
+    impulse_2 = impulses_2.total
 
     print('-' * 55)
     print(f"Momentum before impact: CASE 1: {p0_1:.3f}, CASE 2: {p0_2:.3f}")
     print(f"Momentum after  impact: CASE 1: {pf_1:.3f}, CASE 2: {pf_2:.3f}")
     print(f"\nTotal Impulse Case 1: {impulse_1:.3f}\nTotal Impulse Case 2: {impulse_2:.3f}")
+    # peak deceleration, and the impact window around it:
+    for case, times, accelerations, impulses in ((1, times_1, accelerations_1, impulses_1), (2, times_2, accelerations_2, impulses_2)):
+        peak_time, peak, index = peak_deceleration(times, accelerations)
+        start, end = next(((start, end) for start, end in impact_windows(accelerations) if start <= index < end), (index, index + 1))
+        print(f"\nPeak deceleration Case {case}: {peak:.3f} at {peak_time:.4f} s, impact from {times[start]:.4f} s to {times[end - 1]:.4f} s")
+        # unsorted raw data still gets its totals, only the window lookups need sorted times:
+        if impulses.ordered:
+            print(f"Impulse during impact Case {case}: {impulses.impulse(times[start], times[end - 1]):.3f}, peak 20 ms impulse: {impulses.peak(0.02)[1]:.3f}")
     print('-' * 55)
     ######################## END: IMPULSE AND MOMENTUM ANALYSIS ########################
-    
-    plt.show()
+
+    if profile is not None:
+        profiler.stop()
+        profiler.write(profile)
+
+    if not args.headless:
+        plt.show()
+
+def batch_main(argv: list):
+    """
+    Command-line entry point for batch mode:
+        python dynamics.py batch <workbook folder or glob> <case table CSV> <results CSV> [--workers N] [--profile FILE]
+    """
+    parser = argparse.ArgumentParser(prog = 'dynamics.py batch', description = 'Batch crash analysis over many workbooks.')
+    parser.add_argument('workbooks', help = 'folder of .xlsx files or a glob pattern')
+    parser.add_argument('cases', help = 'CSV with worksheet, mass, v0 and optional padding, workbook columns')
+    parser.add_argument('output', help = 'CSV file to write the results table to')
+    parser.add_argument('--workers', type = int, default = None, help = 'number of worker processes (default: all cores)')
+    parser.add_argument('--profile', metavar = 'FILE', help = f'write per-stage timing and memory as JSON to FILE (- for stderr), same as setting {PROFILE_ENV}')
+    args = parser.parse_args(argv)
+    profile = _profile_target(args.profile)
+    # the workers do the measuring, this process only collects their totals:
+    profiler = StageProfiler() if profile is not None else None
+
+    rows = run_batch(args.workbooks, read_case_table(args.cases), args.output, args.workers, profiler)
+    print(f"Wrote {rows} case results to {args.output}")
+    if profile is not None:
+        profiler.write(profile)
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ['batch']:
+        batch_main(sys.argv[2:])
+    else:
+        main()
@@ -1,3 +1,8 @@
+import contextlib
+import itertools
+import threading
+
+
 class Jar:
     # initializes a cookie jar with the given capacity(the maximum number of cookies that can fit in the cookie jar)
     def __init__(self, capacity: int =12):
@@ -50,3 +55,203 @@ class Jar:
     # returns a str with n 🍪, where n is the number of cookies in the cookie jar.
     def __str__(self) -> str:
         return "🍪" * self.size
+
+
+# a Jar that many threads can share: every check-and-update happens atomically under one lock,
+# and with __slots__ plus plain attributes there is no property call on the hot path.
+class ConcurrentJar:
+    __slots__ = ("_capacity", "_size", "_changed", "_waiting")
+
+    def __init__(self, capacity: int = 12):
+        # capacity must be a non-negative integer, same as Jar. If not, raise a ValueError.
+        if not isinstance(capacity, int) or capacity < 0:
+            raise ValueError
+        self._capacity = capacity
+        self._size = 0
+        # one lock, with a condition on it so waiting threads wake up whenever the size changes:
+        self._changed = threading.Condition(threading.Lock())
+        self._waiting = 0  # threads blocked in wait_deposit/wait_withdraw, nobody is woken up when it's 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def size(self):
+        return self._size
+
+    # adds n cookies if they fit, returns whether it did. Never raises for a full jar, never waits.
+    def try_deposit(self, n: int) -> bool:
+        _check_count(n)
+        with self._changed:
+            if self._size + n > self._capacity:
+                return False
+            self._size += n
+            if self._waiting:
+                self._changed.notify_all()
+            return True
+
+    # removes n cookies if there are that many, returns whether it did. Never waits.
+    def try_withdraw(self, n: int) -> bool:
+        _check_count(n)
+        with self._changed:
+            if self._size < n:
+                return False
+            self._size -= n
+            if self._waiting:
+                self._changed.notify_all()
+            return True
+
+    # same as Jar.deposit: if adding n cookies exceed the cookie jar's capacity, raise a ValueError.
+    def deposit(self, n: int):
+        if not self.try_deposit(n):
+            raise ValueError
+
+    # same as Jar.withdraw: if there aren't n cookies in the cookie jar, raise a ValueError.
+    def withdraw(self, n: int):
+        if not self.try_withdraw(n):
+            raise ValueError
+
+    # waits (up to timeout seconds, forever if None) until n cookies fit, then adds them. Returns False on timeout.
+    def wait_deposit(self, n: int, timeout: float = None) -> bool:
+        _check_count(n)
+        if n > self._capacity:  # would never fit, don't wait for it
+            raise ValueError
+        with self._changed:
+            if not self._wait_for(lambda: self._size + n <= self._capacity, timeout):
+                return False
+            self._size += n
+            if self._waiting:
+                self._changed.notify_all()
+            return True
+
+    # waits (up to timeout seconds, forever if None) until there are n cookies, then removes them. Returns False on timeout.
+    def wait_withdraw(self, n: int, timeout: float = None) -> bool:
+        _check_count(n)
+        if n > self._capacity:  # there will never be that many, don't wait for it
+            raise ValueError
+        with self._changed:
+            if not self._wait_for(lambda: self._size >= n, timeout):
+                return False
+            self._size -= n
+            if self._waiting:
+                self._changed.notify_all()
+            return True
+
+    # waits on the condition (the lock must be held) while counting this thread as waiting:
+    def _wait_for(self, predicate, timeout: float = None) -> bool:
+        self._waiting += 1
+        try:
+            return self._changed.wait_for(predicate, timeout)
+        finally:
+            self._waiting -= 1
+
+    # applies a batch of changes (positive = deposit, negative = withdraw) in order, all or nothing, under one lock.
+    # If any step would overfill or overdraw the jar, nothing is applied and a ValueError is raised.
+    def apply(self, changes) -> int:
+        changes = list(changes)
+        for change in changes:
+            _check_count(abs(change))
+        with self._changed:
+            size = self._size
+            for change in changes:
+                size += change
+                if not 0 <= size <= self._capacity:
+                    raise ValueError
+            self._size = size
+            if self._waiting:
+                self._changed.notify_all()
+            return size
+
+    # returns a str with n 🍪, where n is the number of cookies in the cookie jar.
+    def __str__(self) -> str:
+        return "🍪" * self._size
+
+
+# cookie counts must be non-negative integers:
+def _check_count(n: int):
+    if not isinstance(n, int) or n < 0:
+        raise ValueError
+
+
+# a pool of ConcurrentJar shards that together act as one jar of the given capacity. Each thread sticks to its own shard,
+# so threads don't fight over one lock. When a thread's shard can't serve it (too full or too empty), the pool takes every
+# shard's lock (always in the same order), checks the whole pool, and spreads cookies and capacity evenly over the shards again.
+class ShardedJar:
+    __slots__ = ("_shards", "_affinity", "_next_shard", "_rebalance")
+
+    def __init__(self, capacity: int = 12, shards: int = 4):
+        if not isinstance(capacity, int) or capacity < 0 or not isinstance(shards, int) or shards < 1:
+            raise ValueError
+        # split the capacity as evenly as possible, the first shards get one more if it doesn't divide:
+        self._shards = [ConcurrentJar(capacity // shards + (i < capacity % shards)) for i in range(shards)]
+        self._affinity = threading.local()  # which shard this thread uses
+        self._next_shard = itertools.count()  # new threads get shards round-robin
+        self._rebalance = threading.Lock()  # only one thread rebalances at a time
+
+    # the shard this thread was given the first time it used the pool:
+    def _home(self) -> ConcurrentJar:
+        try:
+            return self._affinity.shard
+        except AttributeError:
+            self._affinity.shard = self._shards[next(self._next_shard) % len(self._shards)]
+            return self._affinity.shard
+
+    @property
+    def shards(self):
+        return len(self._shards)
+
+    @property
+    def capacity(self):
+        with self._all_shards():
+            return sum(shard._capacity for shard in self._shards)
+
+    # the number of cookies in the whole pool, read with every shard locked so it's an exact snapshot:
+    @property
+    def size(self):
+        with self._all_shards():
+            return sum(shard._size for shard in self._shards)
+
+    # adds n cookies if the pool has room for them, returns whether it did:
+    def try_deposit(self, n: int) -> bool:
+        return self._home().try_deposit(n) or self._steal(n)
+
+    # removes n cookies if the pool has that many, returns whether it did:
+    def try_withdraw(self, n: int) -> bool:
+        return self._home().try_withdraw(n) or self._steal(-n)
+
+    # same as Jar.deposit: if adding n cookies exceed the pool's capacity, raise a ValueError.
+    def deposit(self, n: int):
+        if not self.try_deposit(n):
+            raise ValueError
+
+    # same as Jar.withdraw: if there aren't n cookies in the pool, raise a ValueError.
+    def withdraw(self, n: int):
+        if not self.try_withdraw(n):
+            raise ValueError
+
+    # locks every shard, in index order so two threads can never wait on each other:
+    def _all_shards(self):
+        stack = contextlib.ExitStack()
+        for shard in self._shards:
+            stack.enter_context(shard._changed)
+        return stack
+
+    # SLOW PATH: the home shard can't serve a change (positive = deposit, negative = withdraw), so apply it to the pool
+    # as a whole and rebalance. Returns False if the whole pool can't serve it either.
+    def _steal(self, change: int) -> bool:
+        with self._rebalance, self._all_shards():
+            size = sum(shard._size for shard in self._shards) + change
+            capacity = sum(shard._capacity for shard in self._shards)
+            if not 0 <= size <= capacity:
+                return False
+            # spread cookies and capacity evenly again, no shard ever ends up with more cookies than room:
+            count = len(self._shards)
+            for i, shard in enumerate(self._shards):
+                shard._capacity = capacity // count + (i < capacity % count)
+                shard._size = size // count + (i < size % count)
+            return True
+
+    # returns a str with n 🍪, where n is the number of cookies in the whole pool.
+    def __str__(self) -> str:
+        return "🍪" * self.size
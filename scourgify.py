@@ -4,39 +4,244 @@ Expects the user to provide two command-line arguments:
     the name of an existing CSV file to read as input, whose columns are assumed to be, in order, name and house, and
     the name of a new CSV to write as output, whose columns should be, in order, first, last, and house.
 Converts that input to that output, splitting each name into a first name and last name.
+
+Rows are streamed: read, converted and written in batches, so memory stays flat however large the input is.
+The conversion is also importable: transform(source, sink) works on file objects or iterables of rows, in process.
+
+Optional flags, anywhere on the command line:
+    --jobs=N   split the input into N shards converted on N worker processes, then merged back in order
+    --stats    print how many rows were converted and the rows/sec
 """
-from sys import exit, argv
-from csv import DictReader, DictWriter
-
-# too few arguments:
-if len(argv) < 3:
-    exit("Too few command-line arguments")
-# too many arguments:
-if len(argv) > 3:
-    exit("Too many command-line arguments")
-
-# list to store newly formatted data, where each elemnt is a dictionary of each student containing, first name, last name, and house:
-students = []
-
-# read the initial file and rearrange then into new file format, storing them into students list:
-try:
-    with open(argv[1]) as oldfile:  # open the first CSV file to read
-        for row in DictReader(oldfile):  # read each lines in the file as a dictionary
-            # identify the first and last name append them alonside the house:
-            students.append(
-                { 
-                    "first": row["name"].split(", ")[1],  # last name comes after comma and a blank in "name"
-                    "last": row["name"].split(", ")[0],  # first name is everything before comma in "name"
-                    "house": row["house"],  # house is just house, same
-                }
-            )
-except FileNotFoundError:  # if the file's not found, exit
-    exit("Could not read invalid_file.csv")
-
-# write new file with cleaned-up format:
-with open(argv[2], "w") as newfile:
-    # using DictWriter, create a new file with apt field headers for 3 columns:
-    writer = DictWriter(newfile, fieldnames=["first", "last", "house"])
-    writer.writeheader()  # can't forget the header at the top
-    # because students already have iterables of dictionaries, we can use writerows:
-    writer.writerows(students)
+from sys import exit, argv, stderr
+from csv import DictReader, DictWriter, reader, writer as csv_writer
+from itertools import chain, islice
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import mmap
+import os
+import shutil
+
+# number of converted rows handed to writerows at once:
+BATCH_SIZE = 4096
+# bytes read at a time while looking for shard boundaries:
+SCAN_BLOCK = 1 << 20
+FIELDNAMES = ["first", "last", "house"]
+
+
+# converts one student from the old format into the new one, splitting the name only once:
+def convert_row(row: dict) -> dict:
+    names = row["name"].split(", ")
+    return {
+        "first": names[1],  # last name comes after comma and a blank in "name"
+        "last": names[0],  # first name is everything before comma in "name"
+        "house": row["house"],  # house is just house, same
+    }
+
+
+# groups an iterable into lists of at most size items, lazily:
+def batched(iterable, size: int = BATCH_SIZE):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# converts one (name, house) record into a (first, last, house) tuple, the fast path's version of convert_row:
+def convert_record(name: str, house: str) -> tuple:
+    names = name.split(", ")
+    return names[1], names[0], house
+
+
+# converts rows that are dicts (with "name" and "house" keys) or sequences (columns in fieldnames order, (name, house) by default)
+# into (first, last, house) tuples, lazily:
+def convert_rows(rows, fieldnames: list = None):
+    rows = iter(rows)
+    # the first non-blank row decides between dicts and sequences:
+    if (first := next((row for row in rows if row), None)) is None:
+        return
+    rows = chain([first], rows)
+    if isinstance(first, dict):
+        for row in rows:
+            yield convert_record(row["name"], row["house"])
+    else:
+        try:
+            name, house = (fieldnames.index("name"), fieldnames.index("house")) if fieldnames else (0, 1)
+        except ValueError:
+            raise ValueError("input needs name and house columns")
+        for row in rows:
+            # csv.reader gives [] for a blank line, DictReader skips those, so skip them here too:
+            if not row:
+                continue
+            yield convert_record(row[name], row[house])
+
+
+def transform(source, sink, header: bool = True, fieldnames: list = None, fast: bool = True) -> int:
+    """
+    Converts students from the old format to the new one, in process, streaming in batches.
+
+    source: a text file object (CSV, first line is the header unless fieldnames is given),
+            or an iterable of rows, either dicts with "name" and "house" or (name, house) sequences.
+    sink:   a text file object (CSV is written, with a header unless header is False),
+            anything with writerows (e.g. a csv.writer), or a list to extend with (first, last, house) tuples.
+    fast:   use plain csv.reader/csv.writer tuples (default); False goes through DictReader/DictWriter per-row dicts,
+            like the original script. False only applies when both source and sink are file objects, there is no
+            CSV to parse or write otherwise, so iterables and writerows/list sinks always take the tuple path.
+
+    Returns the number of rows converted.
+    """
+    # SLOW PATH: one dict per row in and out, like the original script:
+    if not fast and hasattr(source, "read") and hasattr(sink, "write"):
+        writer = DictWriter(sink, fieldnames=FIELDNAMES)
+        if header:
+            writer.writeheader()  # can't forget the header at the top
+        rows = 0
+        for batch in batched(map(convert_row, DictReader(source, fieldnames=fieldnames))):
+            writer.writerows(batch)
+            rows += len(batch)
+        return rows
+
+    # FAST PATH: tuples all the way.
+    # a file object is read as CSV, its first line is the header:
+    if hasattr(source, "read"):
+        source = reader(source)
+        if fieldnames is None:
+            fieldnames = next(source, [])
+    students = convert_rows(source, fieldnames)
+
+    # a file object gets CSV written to it:
+    if hasattr(sink, "write"):
+        sink = csv_writer(sink)
+        if header:
+            sink.writerow(FIELDNAMES)
+    if hasattr(sink, "writerows"):
+        write = sink.writerows
+    elif hasattr(sink, "extend"):
+        write = sink.extend
+    else:
+        raise TypeError("sink must be a file object, have writerows, or be a list")
+
+    rows = 0
+    for batch in batched(students):
+        write(batch)
+        rows += len(batch)
+    return rows
+
+
+# converts the whole file in one pass on this process, returns the number of rows.
+# both files use encoding, the locale's preferred encoding (like open) if it's None:
+def convert_file(old_name: str, new_name: str, encoding: str = None) -> int:
+    with open(old_name, encoding=encoding) as oldfile, open(new_name, "w", encoding=encoding) as newfile:
+        return transform(oldfile, newfile)
+
+
+# finds the byte offset just past the first newline at or after start that isn't inside a quoted field.
+# quotes is the number of " characters before start, a field like "Abbott, Hannah" can't be split because
+# a newline only ends a record when the quotes before it are balanced (an escaped "" counts twice, so it stays balanced).
+def _record_end(data: mmap.mmap, start: int, quotes: int) -> int:
+    while (newline := data.find(b"\n", start)) != -1:
+        quotes += data[start:newline].count(b'"')
+        if quotes % 2 == 0:
+            return newline + 1
+        start = newline + 1
+    return len(data)
+
+
+# splits the data rows of a CSV file into about equal byte ranges that start and end on record boundaries:
+def find_shards(old_name: str, shards: int) -> list:
+    with open(old_name, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            # the first record is the header:
+            start = _record_end(data, 0, 0)
+            bounds, quotes, counted = [start], 0, 0
+            for shard in range(1, shards):
+                target = max(start + (size - start) * shard // shards, bounds[-1])
+                # count the quotes up to the target a block at a time, to know if the target is inside a quoted field:
+                while counted < target:
+                    end = min(counted + SCAN_BLOCK, target)
+                    quotes += data[counted:end].count(b'"')
+                    counted = end
+                bounds.append(_record_end(data, target, quotes))
+            bounds.append(size)
+    # drop empty shards (tiny files, or boundaries that landed on the same record):
+    return [(begin, end) for begin, end in zip(bounds, bounds[1:]) if end > begin]
+
+
+# yields the text lines of the byte range [start, end) of a file, end must be a record boundary.
+# lines are decoded with the same encoding the serial path reads the file with:
+def _read_lines(old_name: str, start: int, end: int, encoding: str):
+    with open(old_name, "rb") as file:
+        file.seek(start)
+        while file.tell() < end and (line := file.readline()):
+            yield line.decode(encoding)
+
+
+# worker process: converts one shard into its own file, without a header, returns the number of rows:
+def _convert_shard(old_name: str, start: int, end: int, fieldnames: list, shard_name: str, encoding: str) -> int:
+    with open(shard_name, "w", encoding=encoding) as shardfile:
+        return transform(reader(_read_lines(old_name, start, end, encoding)), shardfile, header=False, fieldnames=fieldnames)
+
+
+# converts the file on several worker processes and merges the shards back in the original row order, returns the number of rows:
+def convert_file_parallel(old_name: str, new_name: str, jobs: int = None, encoding: str = None) -> int:
+    jobs = jobs or os.cpu_count()
+    # the header row decides the column order of the input, and opening it resolves the encoding the same way convert_file does:
+    with open(old_name, encoding=encoding) as oldfile:
+        fieldnames = next(reader(oldfile), [])
+        encoding = oldfile.encoding
+    shards = find_shards(old_name, jobs)
+
+    with TemporaryDirectory() as folder, ProcessPoolExecutor(max_workers=jobs) as executor:
+        shard_names = [os.path.join(folder, f"{index}.csv") for index in range(len(shards))]
+        futures = [executor.submit(_convert_shard, old_name, start, end, fieldnames, name, encoding) for (start, end), name in zip(shards, shard_names)]
+        rows = sum(future.result() for future in futures)
+
+        # one header, then every shard in order:
+        with open(new_name, "w", encoding=encoding) as newfile:
+            csv_writer(newfile).writerow(FIELDNAMES)
+            for name in shard_names:
+                with open(name, newline="", encoding=encoding) as shardfile:
+                    shutil.copyfileobj(shardfile, newfile)
+    return rows
+
+
+def main():
+    # --flags can go anywhere, everything else is a file name:
+    options = [arg for arg in argv[1:] if arg.startswith("--")]
+    files = [arg for arg in argv[1:] if not arg.startswith("--")]
+
+    # too few arguments:
+    if len(files) < 2:
+        exit("Too few command-line arguments")
+    # too many arguments:
+    if len(files) > 2:
+        exit("Too many command-line arguments")
+
+    jobs = None
+    for option in options:
+        if option.startswith("--jobs="):
+            try:
+                jobs = int(option.removeprefix("--jobs="))
+            except ValueError:
+                exit("--jobs must be a whole number")
+            # 0 or fewer workers would either fall back to the serial path unnoticed or crash the pool:
+            if jobs < 1:
+                exit("--jobs must be a positive whole number")
+        elif option != "--stats":
+            exit(f"Unknown option {option}")
+
+    # if the file to read is not found, exit:
+    if not os.path.isfile(files[0]):
+        exit("Could not read invalid_file.csv")
+
+    start = perf_counter()
+    rows = convert_file_parallel(*files, jobs) if jobs else convert_file(*files)
+    seconds = perf_counter() - start
+    if "--stats" in options:
+        print(f"{rows} rows in {seconds:.3f} s ({rows / seconds if seconds else 0:.0f} rows/sec)", file=stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 from datetime import date
+from functools import lru_cache
 from re import fullmatch
 from sys import exit
-import inflect
 
 
 # this function validates if the user enters correct DoB in YYYY-MM-DD format
@@ -23,10 +23,95 @@ def valid_DOB(dateOfBirth):
 # this function accepts timedelta object from datetime library and converts total seconds to minutes.
 get_minutes = lambda timedelta: int(timedelta.total_seconds() / 60)
 
-# this function accepts a numeric value of minutes and returns English words of that number:
-nums_to_words = lambda number: inflect.engine().number_to_words(
-    number, andword=""
-)  # without any "and" between words
+
+# inflect is only imported, and its engine only built, the first time it's actually needed, then reused:
+@lru_cache(maxsize=1)
+def inflect_engine():
+    import inflect
+
+    return inflect.engine()
+
+
+# words for 0-19 and the tens, and the name of every group of 3 digits:
+ONES = "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen sixteen seventeen eighteen nineteen".split()
+TENS = "_ _ twenty thirty forty fifty sixty seventy eighty ninety".split()
+SCALES = ["", " thousand", " million", " billion", " trillion"]
+
+
+# words for a number below 1000, e.g. 525 -> "five hundred twenty-five":
+def below_1000(n):
+    hundreds, rest = divmod(n, 100)
+    tail = ONES[rest] if rest < 20 else TENS[rest // 10] + (f"-{ONES[rest % 10]}" if rest % 10 else "")
+    if not hundreds:
+        return tail
+    return f"{ONES[hundreds]} hundred" + (f" {tail}" if rest else "")
+
+
+# precomputed once for every number below 1000:
+BELOW_1000 = [below_1000(n) for n in range(1000)]
+
+
+# this function accepts a numeric value of minutes and returns English words of that number,
+# exactly like inflect's number_to_words(number, andword="") (without any "and" between words), but from tables:
+@lru_cache(maxsize=4096)
+def nums_to_words(number):
+    # anything outside the tables (negative, a quadrillion or more, not an int) goes to inflect itself:
+    if not isinstance(number, int) or not 0 <= number < 1000 ** len(SCALES):
+        return inflect_engine().number_to_words(number, andword="")
+    if number < 1000:
+        return BELOW_1000[number]
+
+    # split into groups of 3 digits, lowest first, and name the non-zero ones from the highest down:
+    groups = []
+    while number:
+        number, group = divmod(number, 1000)
+        groups.append(group)
+    words = [BELOW_1000[group] + SCALES[scale] for scale, group in reversed(list(enumerate(groups))) if group]
+    # like inflect, groups are separated by commas, except a last group below 100 that just follows with a space:
+    if groups[0] and groups[0] < 100:
+        return ", ".join(words[:-1]) + " " + words[-1]
+    return ", ".join(words)
+
+
+# this function is the bulk version of valid_DOB + get_minutes: it takes many YYYY-MM-DD strings at once,
+# parses and validates all of them with NumPy array operations, and subtracts them from one reference date in one go.
+# instead of exiting, every bad row is reported: it returns (minutes, errors), where
+#   minutes is an int64 array of minutes alive (0 for bad rows), and
+#   errors is a list with None for good rows and "Invalid date" for bad ones (wrong format, or no such day like 2023-02-30)
+def minutes_alive_many(dates_of_birth, today=None):
+    import numpy as np  # only the batch API needs NumPy, so the CLI doesn't pay for importing it
+
+    # any iterable works, generators included:
+    if not isinstance(dates_of_birth, np.ndarray):
+        dates_of_birth = list(dates_of_birth)
+    strings = np.asarray(dates_of_birth, dtype=str).ravel()
+    count = len(strings)
+    reference = np.datetime64(today or date.today(), "D")
+    if count == 0:
+        return np.zeros(0, dtype=np.int64), []
+
+    # 1: FORMAT, every string must be exactly 10 characters: 4 digits, '-', 2 digits, '-', 2 digits
+    valid = np.char.str_len(strings) == 10
+    # look at the characters as an (n, 10) array of code points:
+    codes = np.where(valid, strings, "0000-00-00").astype("U10").view(np.uint32).reshape(count, 10)
+    digits = codes[:, [0, 1, 2, 3, 5, 6, 8, 9]].astype(np.int64) - ord("0")
+    valid &= np.all((digits >= 0) & (digits <= 9), axis=1) & (codes[:, 4] == ord("-")) & (codes[:, 7] == ord("-"))
+
+    # 2: the numbers, (year, month, day) like valid_DOB returns:
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    day = digits[:, 6] * 10 + digits[:, 7]
+    valid &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1)
+
+    # 3: REAL DATES, build them from months since 1970 plus days, a day past the end of its month lands in the next month:
+    months = np.where(valid, (year - 1970) * 12 + month - 1, 0).astype("datetime64[M]")
+    days = months.astype("datetime64[D]") + np.where(valid, day - 1, 0)
+    valid &= days.astype("datetime64[M]") == months
+
+    # 4: minutes between each date and the reference, whole days like get_minutes on two dates:
+    minutes = np.where(valid, (reference - days).astype(np.int64) * 24 * 60, 0)
+    errors = [None if ok else "Invalid date" for ok in valid.tolist()]
+    return minutes, errors
 
 
 def main():
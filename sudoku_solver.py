@@ -1,3 +1,16 @@
+import argparse
+import dbm
+import random
+import sys
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from itertools import islice, permutations, product
+from operator import itemgetter
+from math import isqrt
+from multiprocessing import Pool
+from time import perf_counter
+
+
 def main():
     example_board = [
         [5, 1, 8, 6, 0, 0, 4, 0, 0],  # 0
@@ -12,7 +25,7 @@ def main():
     ]  # 0 1 2 3 4 5 6 7 8
     print("\n\nNew SudoKo Board:\n")
     print_board(example_board)
-    fill_board(example_board)
+    solve_board(example_board)
     print("\n\nSOLVED:\n")
     print_board(example_board)
     print()
@@ -27,19 +40,22 @@ def print_board(board: list):
     :return: void function, prints out the Sudoku board
     :rtype: none
     """
+    # box side length (3 for a 9 x 9 board) and width of the widest number (2 for 16 x 16 and up):
+    size, box = len(board), isqrt(len(board))
+    width = len(str(size))
     # loop through each row:
-    for row in range(len(board)):
+    for row in range(size):
         # for every 3 row elemnt, we need to print out a horzontal line:
-        if row != 0 and row % 3 == 0:  # make sure it's not the first row
-            print("-" * 22)
+        if row != 0 and row % box == 0:  # make sure it's not the first row
+            print("-" * (size * (width + 1) + (box - 1) * 2))
         # loop through each column:
-        for col in range(len(board[7])):  # why 7? cause it's lucky
+        for col in range(size):
             # for every 3 column elemnt, we need to print out a vertical line
-            if col != 0 and col % 3 == 0:  # make sure it's not the first column
+            if col != 0 and col % box == 0:  # make sure it's not the first column
                 print("| ", end="")  # make sure it doesn't go to next line
             # prints the cell element. But if it's the last column, we move to the next row:
-            print(board[row][col]) if col == 8 else print(board[row][col], end=" ")
-
+            cell = str(board[row][col]).rjust(width)
+            print(cell) if col == size - 1 else print(cell, end=" ")
 
 def find_empty_cell(board: list):
     """
@@ -53,7 +69,7 @@ def find_empty_cell(board: list):
     # loop through each row
     for row in range(len(board)):
         # loop through each column
-        for col in range(len(board[7])):  # why 7? cause it's lucky
+        for col in range(len(board[row])):
             # if the cell is empty, denoted by 0, return the coordinate:
             if board[row][col] == 0:
                 return row, col  # tuple of int
@@ -90,7 +106,7 @@ def validate_input(board: list, coordinate: tuple, input: int):
 
     # SECOND, validate the ROW condition:
     # loop through every column cell of that specific row, EXCEPT the empty col_coord we are looking at:
-    for col in range(len(board[7])):
+    for col in range(len(board[row_coord])):
         # if any of the existing elements equal our input number, return False immediately:
         if board[row_coord][col] == input and col != col_coord:
             return False
@@ -130,12 +146,14 @@ def validate_input(board: list, coordinate: tuple, input: int):
     # THIRD, validate the 3 x 3 square condition:
     # we need to first figure out which 3x3 we are in currently:
     # first, find the Square Coordinates of that square:
-    row_square, col_square = row_coord // 3, col_coord // 3
+    # (the square side is 3 on a 9 x 9 board, and sqrt(size) in general):
+    box = isqrt(len(board))
+    row_square, col_square = row_coord // box, col_coord // box
     # NOW, we'll check every cell in that square:
     # loop through each row of that square:
-    for row in range(row_square * 3, row_square * 3 + 3):
+    for row in range(row_square * box, row_square * box + box):
         # loop through each column of that square:
-        for col in range(col_square * 3, col_square * 3 + 3):
+        for col in range(col_square * box, col_square * box + box):
             # if any cell has same number as our input EXCEPT the cell we are inputting our number in, return False:
             if board[row][col] == input and (row, col) != coordinate:
                 return False
@@ -164,8 +182,8 @@ def fill_board(board: list):
         # define an empty cell to solve:
         empty_row, empty_col = empty_cell  # unpacking a tuple
 
-    # NOW: we are going to try numbers from 1 to 9 in the empty cell & see if it works:
-    for input in range(1, 10):
+    # NOW: we are going to try numbers from 1 to 9 (1 to size in general) in the empty cell & see if it works:
+    for input in range(1, len(board) + 1):
         # if input works, replace the empty cell with that value:
         if validate_input(board, empty_cell, input):
             board[empty_row][empty_col] = input
@@ -185,5 +203,977 @@ def fill_board(board: list):
     return False
 
 
+@lru_cache(maxsize=None)
+def _layout(size: int):
+    """
+    Precomputes the row/column/box of every cell of a size x size board, and the cells of every row, column and box.
+
+    :param size: side length of the board (9 for a normal Sudoku)
+    :type size: int
+    :return: (row, col, box) of each flat cell index, and the units as (kind, index, cells) where kind is 0 = row, 1 = column, 2 = box
+    :rtype: tuple
+    """
+    box = isqrt(size)
+    cell_units = tuple((i // size, i % size, (i // size // box) * box + (i % size) // box) for i in range(size * size))
+    units = tuple(
+        (kind, index, tuple(cell for cell in range(size * size) if cell_units[cell][kind] == index))
+        for kind in range(3)
+        for index in range(size)
+    )
+    return cell_units, units
+
+
+@lru_cache(maxsize=None)
+def _peers(size: int):
+    """
+    Precomputes the peers of every cell of a size x size board: the other cells in its row, column and box (20 of them on a 9 x 9 board).
+
+    :param size: side length of the board
+    :type size: int
+    :return: sorted flat indices of the peers of each flat cell index
+    :rtype: tuple of tuple of int
+    """
+    cell_units, _ = _layout(size)
+    return tuple(
+        tuple(other for other in range(size * size) if other != cell and any(a == b for a, b in zip(cell_units[cell], cell_units[other])))
+        for cell in range(size * size)
+    )
+
+
+class FlatBoard:
+    """
+    Compact Sudoku board: all cells in one flat bytearray (row by row, 0 for empty, 81 bytes for a 9 x 9 board)
+    instead of a list of row lists, so lookups skip the double indexing and copies are a single memcpy.
+    Cell (row, col) lives at index row * size + col. Converts losslessly to and from the list-of-lists format.
+    """
+
+    __slots__ = ("size", "cells")
+
+    def __init__(self, size: int = 9, cells: bytes = None):
+        if isqrt(size) ** 2 != size:
+            raise ValueError("board size must be a perfect square")
+        self.size = size
+        self.cells = bytearray(size * size) if cells is None else bytearray(cells)
+        if len(self.cells) != size * size:
+            raise ValueError(f"a {size} x {size} board needs {size * size} cells")
+
+    @classmethod
+    def from_lists(cls, board: list):
+        if any(len(row) != len(board) for row in board):
+            raise ValueError("board must be square")
+        return cls(len(board), bytes(value for row in board for value in row))
+
+    @classmethod
+    def from_line(cls, line: str):
+        # same 81-character line format as parse_puzzle, so only 9 x 9 boards (one character per digit) have a line form:
+        line = line.strip()
+        if len(line) != 81 or any(char not in ".0123456789" for char in line):
+            raise ValueError(f"not an 81-character puzzle line: {line!r}")
+        return cls(9, line.replace(".", "0").encode().translate(_ASCII_TO_DIGIT))
+
+    def to_lists(self):
+        size = self.size
+        return [list(self.cells[row * size : row * size + size]) for row in range(size)]
+
+    def to_line(self):
+        # digits above 9 have no single character, use to_lists for other sizes:
+        if self.size != 9:
+            raise ValueError(f"only a 9 x 9 board has an 81-character line, this one is {self.size} x {self.size}")
+        return self.cells.translate(_DIGIT_TO_ASCII).decode()
+
+    def copy(self):
+        return FlatBoard(self.size, self.cells)
+
+    def __getitem__(self, key):
+        # board[index] or board[row, col]:
+        if isinstance(key, tuple):
+            key = key[0] * self.size + key[1]
+        return self.cells[key]
+
+    def __setitem__(self, key, value: int):
+        if isinstance(key, tuple):
+            key = key[0] * self.size + key[1]
+        self.cells[key] = value
+
+    def __eq__(self, other):
+        return isinstance(other, FlatBoard) and self.size == other.size and self.cells == other.cells
+
+    def __repr__(self):
+        return f"FlatBoard({self.size}, {bytes(self.cells)!r})"
+
+    def find_empty(self):
+        """
+        Flat version of find_empty_cell.
+
+        :return: flat index of the first empty cell, or -1 if there is none
+        :rtype: int
+        """
+        return self.cells.find(0)
+
+    def is_valid_move(self, cell: int, digit: int):
+        """
+        Flat version of validate_input, checks only the precomputed peers of the cell.
+
+        :param cell: flat cell index
+        :param digit: digit to try in that cell
+        :return: whether no peer already holds the digit
+        :rtype: bool
+        """
+        cells = self.cells
+        for peer in _peers(self.size)[cell]:
+            if cells[peer] == digit:
+                return False
+        return True
+
+
+# byte translation tables between the digits 0-9 and their ASCII characters:
+_ASCII_TO_DIGIT = bytes.maketrans(b"0123456789", bytes(range(10)))
+_DIGIT_TO_ASCII = bytes.maketrans(bytes(range(10)), b"0123456789")
+
+
+class _BitmaskSolver:
+    """
+    Constraint-propagation solver state: one bitmask of used digits per row, column and box (bit d set means digit d is used),
+    updated incrementally as cells are filled, plus a trail of filled cells so every guess can be undone.
+    """
+
+    def __init__(self, board: FlatBoard):
+        self.size = size = board.size
+        self.cell_units, self.units = _layout(size)
+        self.all_digits = ((1 << size) - 1) << 1  # bits 1..size
+        self.values = bytearray(board.cells)  # working copy, the caller's board only changes once solved
+        self.masks = ([0] * size, [0] * size, [0] * size)  # rows, columns, boxes
+        self.trail = []
+        self.valid = True
+        # register the givens, a repeated digit in any unit means the board can't be solved:
+        for cell, value in enumerate(self.values):
+            if value:
+                if self.candidates(cell) & (1 << value):
+                    self.set_bit(cell, 1 << value)
+                else:
+                    self.valid = False
+        self.empty = {cell for cell, value in enumerate(self.values) if not value}
+
+    def candidates(self, cell: int) -> int:
+        # digits not used yet in the cell's row, column or box:
+        rows, cols, boxes = self.masks
+        row, col, box = self.cell_units[cell]
+        return self.all_digits & ~(rows[row] | cols[col] | boxes[box])
+
+    def set_bit(self, cell: int, bit: int):
+        rows, cols, boxes = self.masks
+        row, col, box = self.cell_units[cell]
+        rows[row] |= bit
+        cols[col] |= bit
+        boxes[box] |= bit
+
+    def place(self, cell: int, bit: int):
+        self.set_bit(cell, bit)
+        self.values[cell] = bit.bit_length() - 1
+        self.empty.discard(cell)
+        self.trail.append(cell)
+
+    def clear(self, cell: int):
+        # takes a given (not a trail placement) off the board, its digit becomes a candidate again:
+        rows, cols, boxes = self.masks
+        row, col, box = self.cell_units[cell]
+        keep = ~(1 << self.values[cell])
+        rows[row] &= keep
+        cols[col] &= keep
+        boxes[box] &= keep
+        self.values[cell] = 0
+        self.empty.add(cell)
+
+    def restore(self, cell: int, digit: int):
+        # puts a cleared given back:
+        self.set_bit(cell, 1 << digit)
+        self.values[cell] = digit
+        self.empty.discard(cell)
+
+    def undo(self, mark: int):
+        # take back every placement made after the trail had length 'mark':
+        rows, cols, boxes = self.masks
+        while len(self.trail) > mark:
+            cell = self.trail.pop()
+            row, col, box = self.cell_units[cell]
+            keep = ~(1 << self.values[cell])
+            rows[row] &= keep
+            cols[col] &= keep
+            boxes[box] &= keep
+            self.values[cell] = 0
+            self.empty.add(cell)
+
+    def propagate(self):
+        """
+        Fills naked singles (a cell with one candidate) and hidden singles (a digit with one possible cell in a unit) until nothing changes.
+
+        :return: None on a contradiction, otherwise the most constrained empty cell and its candidates ((None, 0) if the board is full)
+        :rtype: tuple or None
+        """
+        # this is the hot loop of every solve, so the masks and methods are looked up once and candidates() is inlined:
+        rows, cols, boxes = masks = self.masks
+        cell_units, all_digits, empty, place = self.cell_units, self.all_digits, self.empty, self.place
+        # candidates of every empty cell as of the last naked singles pass (0 once filled), so hidden singles can reuse them:
+        candidates = [0] * len(self.values)
+        while True:
+            # NAKED SINGLES, and find the cell with the fewest candidates (MRV) on the way:
+            best_cell, best_candidates, best_count = None, 0, self.size + 1
+            progress = False
+            for cell in tuple(empty):
+                row, col, box = cell_units[cell]
+                bits = all_digits & ~(rows[row] | cols[col] | boxes[box])
+                if not bits:
+                    return None  # dead end, nothing fits here
+                if not bits & (bits - 1):  # exactly one bit set
+                    place(cell, bits)
+                    candidates[cell] = 0
+                    progress = True
+                else:
+                    candidates[cell] = bits
+                    if (count := bits.bit_count()) < best_count:
+                        best_cell, best_candidates, best_count = cell, bits, count
+            if progress:
+                continue
+            if best_cell is None:
+                return None, 0  # no empty cells left, solved
+
+            # HIDDEN SINGLES, per unit find the digits that fit in exactly one of its empty cells:
+            for kind, index, unit in self.units:
+                once = twice = 0
+                if progress:
+                    # a hidden single went in earlier in this pass, so this unit's candidates may be stale, narrow them by the masks:
+                    for cell in unit:
+                        if bits := candidates[cell]:
+                            row, col, box = cell_units[cell]
+                            candidates[cell] = bits = bits & ~(rows[row] | cols[col] | boxes[box])
+                            twice |= once & bits
+                            once |= bits
+                else:
+                    for cell in unit:
+                        bits = candidates[cell]
+                        twice |= once & bits
+                        once |= bits
+                # a digit the unit still needs but that fits nowhere is a contradiction:
+                if all_digits & ~masks[kind][index] & ~once:
+                    return None
+                if singles := once & ~twice:
+                    for cell in unit:
+                        if bit := candidates[cell] & singles:
+                            if bit & (bit - 1):
+                                return None  # this cell is the only home for two digits
+                            place(cell, bit)
+                            candidates[cell] = 0
+                    progress = True
+            if not progress:
+                return best_cell, best_candidates
+
+    def search(self) -> bool:
+        mark = len(self.trail)
+        if (result := self.propagate()) is None:
+            self.undo(mark)
+            return False
+        cell, candidates = result
+        if cell is None:
+            return True
+        # GUESS each candidate of the most constrained cell, smallest digit first:
+        while candidates:
+            bit = candidates & -candidates  # lowest set bit
+            candidates ^= bit
+            guess_mark = len(self.trail)
+            self.place(cell, bit)
+            if self.search():
+                return True
+            self.undo(guess_mark)
+        self.undo(mark)
+        return False
+
+
+def solve_board(board):
+    """
+    Solves the Sudoku board in place, like fill_board, but with incremental row/column/box bitmasks,
+    naked and hidden single propagation and most-constrained-cell-first guessing instead of rescanning the board.
+
+    :param board: Sudoku board (any n^2 x n^2 size), empty cells are 0
+    :type board: 2D list of int or FlatBoard
+    :return: boolean inidicating whether the board was solved (if not, the board is left unchanged)
+    :rtype: bool
+    """
+    flat = board if isinstance(board, FlatBoard) else FlatBoard.from_lists(board)
+    solver = _BitmaskSolver(flat)
+    if not solver.valid or not solver.search():
+        return False
+
+    # copy the solution back into the caller's board:
+    if isinstance(board, FlatBoard):
+        board.cells[:] = solver.values
+        return True
+    size = solver.size
+    for row in range(size):
+        board[row][:] = solver.values[row * size : row * size + size]
+    return True
+
+
+def _exact_cover_matrix(board: list):
+    """
+    Builds the Dancing Links exact-cover matrix of a size x size board as flat link arrays.
+    Every (cell, digit) choice is a matrix row covering 4 constraint columns: the cell is filled, and the digit appears
+    once in its row, its column and its box. Constraints already met by the givens are left out, and so are choices that clash with them.
+
+    :param board: Sudoku board (any n^2 x n^2 size), empty cells are 0
+    :type board: 2D list of int
+    :return: the link arrays (left, right, up, down, column, column size, (cell, digit) of every node), or None if the givens clash
+    :rtype: tuple or None
+    """
+    size = len(board)
+    box = isqrt(size)
+    if box * box != size or any(len(row) != size for row in board):
+        raise ValueError("board must be n^2 x n^2")
+    area = size * size
+
+    def constraints(row, col, digit):
+        # ids of the 4 constraint columns one (cell, digit) choice covers:
+        d = digit - 1
+        return (
+            row * size + col,
+            area + row * size + d,
+            2 * area + col * size + d,
+            3 * area + ((row // box) * box + col // box) * size + d,
+        )
+
+    # 1: constraints the givens already meet, the same one met twice means the givens clash:
+    met = set()
+    for row in range(size):
+        for col in range(size):
+            if digit := board[row][col]:
+                if not 1 <= digit <= size:
+                    raise ValueError(f"cell value {digit} out of range for a {size} x {size} board")
+                ids = constraints(row, col, digit)
+                if met.intersection(ids):
+                    return None
+                met.update(ids)
+
+    # 2: one column header per constraint still open, node 0 is the root, all linked in a circle:
+    header = {}
+    for constraint in range(4 * area):
+        if constraint not in met:
+            header[constraint] = len(header) + 1
+    columns = len(header)
+    left = [i - 1 for i in range(columns + 1)]
+    right = [i + 1 for i in range(columns + 1)]
+    left[0], right[columns] = columns, 0
+    up, down = list(range(columns + 1)), list(range(columns + 1))
+    column = list(range(columns + 1))
+    column_size = [0] * (columns + 1)
+    choice = [None] * (columns + 1)
+
+    # 3: one matrix row per (empty cell, digit) choice that doesn't clash with the givens:
+    for row in range(size):
+        for col in range(size):
+            if board[row][col]:
+                continue
+            for digit in range(1, size + 1):
+                ids = constraints(row, col, digit)
+                if met.intersection(ids):
+                    continue
+                first = len(left)
+                for offset, constraint in enumerate(ids):
+                    node, top = first + offset, header[constraint]
+                    # link horizontally into this row's circle:
+                    left.append(first + (offset - 1) % 4)
+                    right.append(first + (offset + 1) % 4)
+                    # link vertically at the bottom of the column:
+                    up.append(up[top])
+                    down.append(top)
+                    down[up[top]] = node
+                    up[top] = node
+                    column.append(top)
+                    column_size[top] += 1
+                    choice.append((row, col, digit))
+    return left, right, up, down, column, column_size, choice
+
+
+def _dancing_links(left, right, up, down, column, column_size):
+    """
+    Knuth's Algorithm X on the link arrays, iterative (no recursion limit on 25 x 25 boards).
+    Always branches on the column with the fewest rows left.
+
+    :return: generator of solutions, each the list of chosen row nodes (the same list object, copy it to keep it)
+    :rtype: generator
+    """
+
+    def cover(col):
+        left[right[col]], right[left[col]] = left[col], right[col]
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                up[down[j]], down[up[j]] = up[j], down[j]
+                column_size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(col):
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                column_size[column[j]] += 1
+                up[down[j]] = down[up[j]] = j
+                j = left[j]
+            i = up[i]
+        left[right[col]] = right[left[col]] = col
+
+    def select(node):
+        # cover the other columns of the chosen row:
+        j = right[node]
+        while j != node:
+            cover(column[j])
+            j = right[j]
+
+    def unselect(node):
+        j = left[node]
+        while j != node:
+            uncover(column[j])
+            j = left[j]
+
+    chosen = []
+    while True:
+        # FORWARD: every column covered means a solution, otherwise branch on the smallest column:
+        if right[0] == 0:
+            yield chosen
+        else:
+            best, col = 0, right[0]
+            while col != 0:
+                if not best or column_size[col] < column_size[best]:
+                    best = col
+                    if not column_size[col]:
+                        break
+                col = right[col]
+            if column_size[best]:
+                cover(best)
+                chosen.append(down[best])
+                select(down[best])
+                continue
+
+        # BACKTRACK: move the deepest choice down to the next row of its column, or give up on that column:
+        while chosen:
+            node = chosen.pop()
+            unselect(node)
+            node = down[node]
+            if node != column[node]:
+                chosen.append(node)
+                select(node)
+                break
+            uncover(column[node])
+        else:
+            return
+
+
+def iter_solutions(board: list):
+    """
+    Enumerates every solution of the board with Dancing Links (exact cover), works on any n^2 x n^2 board (9 x 9, 16 x 16, 25 x 25...).
+    The input board is not changed.
+
+    :param board: Sudoku board, empty cells are 0
+    :type board: 2D list of int
+    :return: generator of solved boards
+    :rtype: generator of 2D list of int
+    """
+    if (matrix := _exact_cover_matrix(board)) is None:
+        return
+    *links, choice = matrix
+    for chosen in _dancing_links(*links):
+        solution = [row[:] for row in board]
+        for node in chosen:
+            row, col, digit = choice[node]
+            solution[row][col] = digit
+        yield solution
+
+
+def count_solutions(board: list, limit: int = 2):
+    """
+    Counts the solutions of the board, stopping early once 'limit' are found.
+    With the default limit of 2 this is a uniqueness check: 0 = no solution, 1 = unique, 2 = more than one.
+
+    :param board: Sudoku board, empty cells are 0
+    :param limit: stop counting here (None counts them all)
+    :type board: 2D list of int
+    :type limit: int
+    :return: number of solutions, at most limit
+    :rtype: int
+    """
+    return sum(1 for _ in islice(iter_solutions(board), limit))
+
+
+def dlx_fill_board(board: list):
+    """
+    Same as fill_board, but solves with Dancing Links so it handles any n^2 x n^2 board.
+
+    :param board: Sudoku board, empty cells are 0
+    :type board: 2D list of int
+    :return: boolean inidicating whether the board was solved (if not, the board is left unchanged)
+    :rtype: bool
+    """
+    for solution in iter_solutions(board):
+        for row, values in zip(board, solution):
+            row[:] = values
+        return True
+    return False
+
+
+def parse_puzzle(line: str):
+    """
+    Turns a puzzle in the standard 81-character line format (row by row, '0' or '.' for empty cells) into a board.
+
+    :param line: 81-character puzzle line
+    :type line: str
+    :return: Sudoku board
+    :rtype: 2D list of int
+    """
+    line = line.strip()
+    if len(line) != 81 or any(char not in ".0123456789" for char in line):
+        raise ValueError(f"not an 81-character puzzle line: {line!r}")
+    digits = [0 if char == "." else int(char) for char in line]
+    return [digits[row * 9 : row * 9 + 9] for row in range(9)]
+
+
+def format_board(board: list):
+    """
+    Turns a board back into the 81-character line format.
+
+    :param board: Sudoku board
+    :type board: 2D list of int
+    :return: 81-character puzzle line
+    :rtype: str
+    """
+    return "".join(str(value) for row in board for value in row)
+
+
+def solve_puzzle(line: str):
+    """
+    Solves one puzzle line with solve_board, timing it.
+
+    :param line: 81-character puzzle line
+    :type line: str
+    :return: the solution line ("" if the line is invalid or has no solution), and the solve time in seconds
+    :rtype: tuple of str and float
+    """
+    start = perf_counter()
+    try:
+        board = FlatBoard.from_line(line)
+        solution = board.to_line() if solve_board(board) else ""
+    except ValueError:
+        solution = ""
+    return solution, perf_counter() - start
+
+
+def solve_many(puzzles, processes: int = None, chunk_size: int = 256):
+    """
+    Solves puzzle lines across a process pool, sending them to the workers in chunks.
+    Results are yielded in the same order as the input, as soon as they're ready, so the input can be a file read lazily.
+
+    :param puzzles: iterable of 81-character puzzle lines
+    :param processes: number of worker processes, defaults to the number of cores
+    :param chunk_size: number of puzzles sent to a worker at once
+    :return: generator of (solution line, solve time) tuples, see solve_puzzle
+    :rtype: generator
+    """
+    with Pool(processes) as pool:
+        yield from pool.imap(solve_puzzle, puzzles, chunksize=chunk_size)
+
+
+def latency_percentiles(latencies: list, percentiles: tuple = (50, 90, 99)):
+    """
+    Nearest-rank percentiles of a list of latencies.
+
+    :param latencies: solve times in seconds
+    :param percentiles: which percentiles to report
+    :return: percentile -> latency in seconds (empty if there are no latencies)
+    :rtype: dict
+    """
+    ordered = sorted(latencies)
+    if not ordered:
+        return {}
+    return {p: ordered[max(0, -(-p * len(ordered) // 100) - 1)] for p in percentiles}
+
+
+# most (row order x column order) arrangements canonical_form compares per orientation before giving up.
+# only boards with almost no structure to tell rows and columns apart get there (an empty board, a full grid), they're keyed as they are:
+CANONICAL_LIMIT = 20000
+
+
+def _tied_orders(items, key):
+    """
+    Every order of items sorted by key (largest first) that only differs in how items with equal keys are arranged.
+
+    :return: list of orders
+    :rtype: list of list
+    """
+    groups = []
+    for item in sorted(items, key=key, reverse=True):
+        if groups and key(groups[-1][0]) == key(item):
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+    return [sum(choice, []) for choice in product(*(list(map(list, permutations(group))) for group in groups))]
+
+
+def _line_orders(keys: list):
+    """
+    Every arrangement of the 9 rows (or columns) that Sudoku symmetry allows, sorting bands by their rows' keys
+    and rows inside each band by key, but trying every order of rows (or bands) that tie.
+
+    :param keys: a key per row that doesn't change under any symmetry
+    :return: list of row orders (9 source rows each)
+    :rtype: list of list of int
+    """
+    inside = [_tied_orders(range(band * 3, band * 3 + 3), keys.__getitem__) for band in range(3)]
+    band_key = lambda band: sorted(keys[band * 3 : band * 3 + 3], reverse=True)
+    return [sum(choice, []) for bands in _tied_orders(range(3), band_key) for choice in product(*(inside[band] for band in bands))]
+
+
+def canonical_form(board: FlatBoard):
+    """
+    Maps a 9 x 9 board to one representative of its symmetry class, so every rotation, reflection, digit relabeling
+    and band/stack/row/column permutation of a puzzle gets the same key.
+
+    Each row (and column) gets a signature that no symmetry changes: its clue count, its clue counts per box,
+    and how often each of its digits appears on the whole board. Rows are arranged by signature within bands and bands by their rows,
+    both orientations (as is, transposed) are tried, and for every arrangement digits are renumbered in order of first appearance.
+    The representative is the smallest line over all of them. Only ties in the signatures have to be tried both ways,
+    which usually leaves a handful of arrangements instead of the 3 million the symmetry group has.
+
+    :param board: 9 x 9 board
+    :type board: FlatBoard
+    :return: the canonical 81-character line, and the transform (source cell of every canonical cell, digit relabeling table)
+    :rtype: tuple of str and tuple
+    """
+    if board.size != 9:
+        raise ValueError("canonical_form works on 9 x 9 boards")
+    cells = bytes(board.cells)
+    frequency = Counter(value for value in cells if value)
+
+    def signature(line):
+        return (
+            len(line) - line.count(0),
+            sorted(3 - line[box * 3 : box * 3 + 3].count(0) for box in range(3)),
+            sorted(frequency[value] for value in line if value),
+        )
+
+    best = None
+    for transposed in (False, True):
+        grid = bytes(cells[col * 9 + row] for row in range(9) for col in range(9)) if transposed else cells
+        rows = [grid[row * 9 : row * 9 + 9] for row in range(9)]
+        row_orders = _line_orders([signature(row) for row in rows])
+        col_orders = _line_orders([signature(grid[col::9]) for col in range(9)])
+        if len(row_orders) * len(col_orders) > CANONICAL_LIMIT:
+            # too little structure to canonicalize cheaply, the board is its own key (only costs cache hits, never correctness):
+            return board.to_line(), (tuple(range(81)), bytes(range(10)))
+
+        for row_order in row_orders:
+            ordered_rows = [rows[row] for row in row_order]
+            for col_order in col_orders:
+                pick = itemgetter(*col_order)
+                line = bytes(value for row in ordered_rows for value in pick(row))
+                # renumber digits by first appearance (0 stays 0):
+                order = [value for value in dict.fromkeys(line) if value]
+                key = line.translate(bytes.maketrans(bytes([0, *order]), bytes(range(len(order) + 1))))
+                if best is None or key < best[0]:
+                    best = key, transposed, row_order, col_order, order
+
+    key, transposed, row_order, col_order, order = best
+    # canonical cell (row, col) comes from (row_order[row], col_order[col]) of the (maybe transposed) board:
+    sources = tuple(
+        (col_order[col] * 9 + row_order[row]) if transposed else (row_order[row] * 9 + col_order[col]) for row in range(9) for col in range(9)
+    )
+    # digits that aren't on the board get the labels after the ones that are, so the relabeling covers 1-9:
+    order += [digit for digit in range(1, 10) if digit not in order]
+    relabel = bytearray(range(10))
+    for label, digit in enumerate(order, start=1):
+        relabel[digit] = label
+    return key.translate(_DIGIT_TO_ASCII).decode(), (sources, bytes(relabel))
+
+
+def _from_canonical(line: str, transform: tuple):
+    """
+    Maps an 81-character line in canonical form (e.g. the solution of the canonical puzzle) back through the inverse transform.
+
+    :param line: 81-character line in canonical form
+    :param transform: the transform canonical_form returned with it
+    :return: 81-character line in the original board's orientation and digits
+    :rtype: str
+    """
+    sources, relabel = transform
+    unlabel = bytes.maketrans(relabel, bytes(range(10)))
+    canonical = line.encode().translate(_ASCII_TO_DIGIT).translate(unlabel)
+    cells = bytearray(81)
+    for cell, source in enumerate(sources):
+        cells[source] = canonical[cell]
+    return cells.translate(_DIGIT_TO_ASCII).decode()
+
+
+class SolutionCache:
+    """
+    Memoizes solve results by canonical form (see canonical_form): puzzles that are rotations, reflections, relabelings or
+    band/stack permutations of each other share one entry, so the whole family costs one solve. A hit is mapped back
+    through the inverse transform. Entries live in a bounded LRU in memory and, if a path is given, in a dbm file on disk
+    that later runs (and other processes, one at a time) reuse.
+    """
+
+    def __init__(self, maxsize: int = 4096, path: str = None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # canonical line -> solution line ("" for no solution), least recently used first
+        self.disk = dbm.open(path, "c") if path else None
+        self.hits = self.misses = 0
+
+    def _lookup(self, key: str):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.disk is not None and (stored := self.disk.get(key)) is not None:
+            self._remember(key, stored.decode())
+            return self.entries[key]
+        return None
+
+    def _remember(self, key: str, solution: str):
+        self.entries[key] = solution
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def solve(self, line: str):
+        """
+        Same result as solve_puzzle, through the cache.
+
+        :param line: 81-character puzzle line
+        :type line: str
+        :return: the solution line ("" if the line is invalid or has no solution)
+        :rtype: str
+        """
+        try:
+            board = FlatBoard.from_line(line)
+        except ValueError:
+            return ""
+        key, transform = canonical_form(board)
+
+        if (solution := self._lookup(key)) is not None:
+            self.hits += 1
+        else:
+            # MISS: solve the canonical puzzle itself, so its solution fits every puzzle with the same key:
+            self.misses += 1
+            canonical = FlatBoard.from_line(key)
+            solution = canonical.to_line() if solve_board(canonical) else ""
+            self._remember(key, solution)
+            if self.disk is not None:
+                self.disk[key] = solution
+        return _from_canonical(solution, transform) if solution else ""
+
+    def solve_timed(self, line: str):
+        # (solution line, seconds), like solve_puzzle:
+        start = perf_counter()
+        solution = self.solve(line)
+        return solution, perf_counter() - start
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def solve_file(input_file: str, output_file: str, processes: int = None, chunk_size: int = 256, cache: SolutionCache = None):
+    """
+    Solves every puzzle in input_file (one 81-character line each, blank lines skipped) and streams the solutions
+    to output_file in the same order, one per line (an empty line for puzzles with no solution).
+    With a cache, puzzles are solved through it in this process instead of on the pool, and the report also has cache_hits.
+
+    :return: throughput report with puzzles, solved, seconds, puzzles_per_sec and latency percentiles (p50, p90, p99, in seconds)
+    :rtype: dict
+    """
+    latencies = []
+    solved = 0
+    start = perf_counter()
+    with open(input_file) as puzzles, open(output_file, "w") as solutions:
+        lines = (line for line in puzzles if line.strip())
+        results = map(cache.solve_timed, lines) if cache is not None else solve_many(lines, processes, chunk_size)
+        for solution, latency in results:
+            solutions.write(solution + "\n")
+            solved += bool(solution)
+            latencies.append(latency)
+    seconds = perf_counter() - start
+
+    report = {
+        "puzzles": len(latencies),
+        "solved": solved,
+        "seconds": seconds,
+        "puzzles_per_sec": len(latencies) / seconds if seconds else 0.0,
+    }
+    report.update({f"p{p}": latency for p, latency in latency_percentiles(latencies).items()})
+    if cache is not None:
+        report["cache_hits"] = cache.hits
+    return report
+
+
+# difficulty -> (fewest clues to stop at, whether naked/hidden singles alone must solve it).
+# easy and medium never need a guess. hard removes clues for as long as the solution stays unique,
+# and only keeps the puzzle if singles alone can't solve it (about half the time, otherwise it starts over from a new board).
+DIFFICULTIES = {
+    "easy": (40, True),
+    "medium": (30, True),
+    "hard": (17, False),
+}
+
+
+def _full_grid(rng: random.Random):
+    """
+    Random solved 9 x 9 board: the three boxes on the diagonal don't share a row or column,
+    so each gets a random permutation of 1-9, and solve_board fills in the rest.
+
+    :return: solved board
+    :rtype: FlatBoard
+    """
+    board = FlatBoard()
+    for box in (0, 4, 8):
+        digits = rng.sample(range(1, 10), 9)
+        for i, digit in enumerate(digits):
+            board[(box // 3) * 3 + i // 3, (box % 3) * 3 + i % 3] = digit
+    solve_board(board)
+    return board
+
+
+def _has_other_solution(solver: _BitmaskSolver, cell: int, digit: int) -> bool:
+    """
+    Uniqueness check after the given 'digit' was cleared from 'cell': the known solution has 'digit' there,
+    so the puzzle has a second solution exactly when one exists with any other digit in that cell.
+    Each search stops at the first such solution, and everything it placed is undone through the trail.
+    """
+    others = solver.candidates(cell) & ~(1 << digit)
+    while others:
+        bit = others & -others
+        others ^= bit
+        mark = len(solver.trail)
+        solver.place(cell, bit)
+        found = solver.search()
+        solver.undo(mark)
+        if found:
+            return True
+    return False
+
+
+def _solved_by_singles(solver: _BitmaskSolver) -> bool:
+    # propagation alone fills the board (so it's also unique), undone again afterwards:
+    mark = len(solver.trail)
+    result = solver.propagate()
+    solver.undo(mark)
+    return result is not None and result[0] is None
+
+
+def generate_puzzle(difficulty: str = "medium", seed: int = None):
+    """
+    Generates a puzzle with exactly one solution by taking clues away from a random solved board, one cell at a time in random order.
+    A single solver state is kept for the whole run: removing a clue clears its bits from the row/column/box masks,
+    the checks run on top of it and are rolled back through the trail, and a clue that has to stay is simply put back.
+    Nothing is ever solved from scratch.
+
+    :param difficulty: one of DIFFICULTIES
+    :param seed: random seed, the same seed and difficulty always give the same puzzle
+    :type difficulty: str
+    :type seed: int
+    :return: the puzzle and its solution as 81-character lines
+    :rtype: tuple of str
+    """
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f"difficulty must be one of {', '.join(DIFFICULTIES)}")
+    fewest_clues, singles_only = DIFFICULTIES[difficulty]
+    rng = random.Random(seed)
+
+    while True:
+        solution = _full_grid(rng)
+        solver = _BitmaskSolver(solution)
+        clues = 81
+        cells = list(range(81))
+        rng.shuffle(cells)
+
+        # one pass is enough: a clue that can't go now can't go later either, since removing more only allows more solutions:
+        for cell in cells:
+            if clues <= fewest_clues:
+                break
+            digit = solver.values[cell]
+            solver.clear(cell)
+            if singles_only:
+                keep = not _solved_by_singles(solver)
+            else:
+                keep = _has_other_solution(solver, cell, digit)
+            if keep:
+                solver.restore(cell, digit)
+            else:
+                clues -= 1
+
+        if singles_only or not _solved_by_singles(solver):
+            return FlatBoard(9, solver.values).to_line(), solution.to_line()
+
+
+def batch_main(argv: list):
+    """
+    Command-line entry point for bulk solving:
+        python sudoku_solver.py <puzzles file> <solutions file> [--processes N] [--chunk-size N] [--cache FILE]
+    """
+    parser = argparse.ArgumentParser(prog="sudoku_solver.py", description="Solve a file of 81-character Sudoku lines.")
+    parser.add_argument("input", help="file with one puzzle per line")
+    parser.add_argument("output", help="file to write the solutions to, in the same order")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="puzzles sent to a worker at once")
+    parser.add_argument("--cache", default=None, help="on-disk solution cache shared by equivalent puzzles (solves in this process)")
+    args = parser.parse_args(argv)
+
+    cache = SolutionCache(path=args.cache) if args.cache else None
+    try:
+        report = solve_file(args.input, args.output, args.processes, args.chunk_size, cache)
+    except FileNotFoundError:
+        sys.exit(f"Could not read {args.input}")
+    finally:
+        if cache is not None:
+            cache.close()
+
+    print(f"Solved {report['solved']} of {report['puzzles']} puzzles in {report['seconds']:.2f} s ({report['puzzles_per_sec']:.0f} puzzles/sec)")
+    if report["puzzles"]:
+        print(" ".join(f"p{p}: {report[f'p{p}'] * 1000:.3f} ms" for p in (50, 90, 99)))
+    if cache is not None:
+        print(f"Cache hits: {report['cache_hits']} of {report['puzzles']}")
+
+
+def generate_main(argv: list):
+    """
+    Command-line entry point for puzzle generation, writes one 81-character puzzle per line:
+        python sudoku_solver.py generate <count> [--difficulty easy|medium|hard] [--seed N] [--output FILE]
+    """
+    parser = argparse.ArgumentParser(prog="sudoku_solver.py generate", description="Generate Sudoku puzzles with a unique solution.")
+    parser.add_argument("count", type=int, help="number of puzzles")
+    parser.add_argument("--difficulty", choices=list(DIFFICULTIES), default="medium", help="how many clues to take away (default: medium)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for repeatable output")
+    parser.add_argument("--output", default=None, help="file to write the puzzles to (default: print them)")
+    args = parser.parse_args(argv)
+
+    # every puzzle gets its own seed, so one puzzle of a seeded run can be regenerated on its own:
+    rng = random.Random(args.seed)
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for _ in range(args.count):
+            puzzle, _ = generate_puzzle(args.difficulty, rng.getrandbits(64))
+            print(puzzle, file=output)
+    finally:
+        if args.output:
+            output.close()
+
+
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["generate"]:
+        generate_main(sys.argv[2:])
+    elif len(sys.argv) > 1:
+        batch_main(sys.argv[1:])
+    else:
+        main()
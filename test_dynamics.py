@@ -0,0 +1,450 @@
+from dynamics import numerical_integration, cumulative_integration, stream_integration, read_csv_chunks, read_xl_data, load_xl_cache, read_cached_data, run_batch, analyze_workbook, decimate_minmax, HeadlessPlotter
+from dynamics import resample_uniform, cfc_filter, cfc_coefficients, condition_signal, peak_deceleration, impact_windows, analyze_case, ImpulseIndex, StageProfiler, main
+import csv
+import json
+from pytest import raises
+import pylightxl as xl
+import numpy as np
+
+
+def test_cumulative_matches_loop():
+    times = np.linspace(0, 0.5, 101)
+    accelerations = np.sin(40 * times) * -9.81
+
+    loop_areas, loop_total = numerical_integration(times, accelerations, initial_value=1.8)
+    areas, total = cumulative_integration(times, accelerations, initial_value=1.8)
+
+    assert np.allclose(areas, loop_areas)
+    assert np.isclose(total, loop_total)
+    assert isinstance(total, float)
+
+
+def test_cumulative_uneven_spacing():
+    times = np.array([0.0, 0.1, 0.15, 0.4, 0.41])
+    accelerations = np.array([1.0, -2.0, 3.5, 0.0, 4.0])
+
+    loop_areas, loop_total = numerical_integration(times, accelerations)
+    areas, total = cumulative_integration(times, accelerations)
+
+    assert np.allclose(areas, loop_areas)
+    assert np.isclose(total, loop_total)
+
+
+def test_cumulative_2d_channels():
+    times = np.linspace(0, 1, 50)
+    channels = np.vstack([np.cos(times), times**2, np.full(50, 3.0)])
+    initial_values = np.array([0.0, 1.6, -2.0])
+
+    areas, totals = cumulative_integration(times, channels, initial_value=initial_values)
+
+    assert areas.shape == channels.shape
+    for row in range(3):
+        loop_areas, loop_total = numerical_integration(times, channels[row], initial_values[row])
+        assert np.allclose(areas[row], loop_areas)
+        assert np.isclose(totals[row], loop_total)
+
+
+def test_cumulative_axis_0():
+    times = np.linspace(0, 1, 20)
+    channels = np.column_stack([np.sin(times), np.exp(times)])
+
+    areas, totals = cumulative_integration(times, channels, axis=0)
+
+    assert areas.shape == channels.shape
+    for col in range(2):
+        loop_areas, loop_total = numerical_integration(times, channels[:, col])
+        assert np.allclose(areas[:, col], loop_areas)
+        assert np.isclose(totals[col], loop_total)
+
+
+def test_stream_matches_whole_array():
+    times = np.linspace(0, 2, 1001)
+    accelerations = np.cos(7 * times) - 0.5
+    chunks = ((times[i:i + 97], accelerations[i:i + 97]) for i in range(0, len(times), 97))
+
+    velocities = stream_integration(chunks, initial_value=1.8)
+    displacements = list(stream_integration(velocities, initial_value=0.0))
+
+    whole_velocities, _ = numerical_integration(times, accelerations, 1.8)
+    whole_displacements, _ = numerical_integration(times, whole_velocities)
+    assert np.allclose(np.concatenate([d for _, d in displacements]), whole_displacements)
+
+
+def test_read_csv_chunks(tmp_path):
+    file = tmp_path / "run.csv"
+    file.write_text("time,acceleration\n" + "".join(f"{t / 10},{t}\n" for t in range(25)))
+
+    chunks = list(read_csv_chunks(str(file), padding=1, chunk_size=10))
+
+    assert [len(times) for times, _ in chunks] == [10, 10, 5]
+    assert np.allclose(np.concatenate([a for _, a in chunks]), np.arange(25))
+
+
+def test_read_csv_chunks_blank_and_short_lines(tmp_path):
+    file = tmp_path / "run.csv"
+    file.write_text("time,acceleration\n0,1\n\n0.1,2\n,\n0.2,3\n")
+    chunks = list(read_csv_chunks(str(file), padding=1, chunk_size=2))
+    assert np.allclose(np.concatenate([a for _, a in chunks]), [1, 2, 3])
+
+    file.write_text("time,acceleration\n0,1\n0.1,2\n0.2\n")
+    with raises(ValueError, match="line 4"):
+        list(read_csv_chunks(str(file), padding=1))
+
+
+def test_xl_cache(tmp_path):
+    workbook = str(tmp_path / "crash.xlsx")
+    db = xl.Database()
+    db.add_ws(ws="Case 1")
+    db.ws("Case 1").update_index(row=1, col=1, val="time")
+    db.ws("Case 1").update_index(row=1, col=2, val="acceleration")
+    for row in range(2, 7):
+        db.ws("Case 1").update_index(row=row, col=1, val=row / 10)
+        db.ws("Case 1").update_index(row=row, col=2, val=-row)
+    xl.writexl(db, workbook)
+
+    times, accelerations = read_cached_data(load_xl_cache(workbook), "Case 1", padding=1)
+    expected = read_xl_data(xl.readxl(workbook), "Case 1", padding=1)
+    assert np.array_equal(times, expected[0]) and np.array_equal(accelerations, expected[1])
+
+    # second load comes from the cache, and a changed workbook invalidates it:
+    assert np.array_equal(read_cached_data(load_xl_cache(workbook), "Case 1", padding=1)[1], expected[1])
+    db.ws("Case 1").update_index(row=2, col=2, val=100)
+    xl.writexl(db, workbook)
+    assert read_cached_data(load_xl_cache(workbook), "Case 1", padding=1)[1][0] == 100
+
+
+def test_run_batch(tmp_path):
+    for name, scale in (("a.xlsx", 1), ("b.xlsx", 2)):
+        db = xl.Database()
+        for worksheet in ("Case 1", "Case 2"):
+            db.add_ws(ws=worksheet)
+            for row in range(1, 11):
+                db.ws(worksheet).update_index(row=row, col=1, val=row / 10)
+                db.ws(worksheet).update_index(row=row, col=2, val=-scale)
+        xl.writexl(db, str(tmp_path / name))
+
+    cases = [
+        {"workbook": "", "worksheet": "Case 1", "mass": 0.4, "v0": 1.8, "padding": 0},
+        {"workbook": "b.xlsx", "worksheet": "Case 2", "mass": 0.5, "v0": 1.6, "padding": 0},
+        {"workbook": "a.xlsx", "worksheet": "Case 9", "mass": 0.5, "v0": 1.6, "padding": 0},
+    ]
+    output = tmp_path / "results.csv"
+
+    profiler = StageProfiler()  # the workers measure, this one only collects their totals
+    assert run_batch(str(tmp_path), cases, str(output), workers=2, profiler=profiler) == 4
+
+    with open(output) as file:
+        rows = list(csv.DictReader(file))
+    assert [(row["workbook"][-6:], row["worksheet"]) for row in rows] == [
+        ("a.xlsx", "Case 1"), ("a.xlsx", "Case 9"), ("b.xlsx", "Case 1"), ("b.xlsx", "Case 2")
+    ]
+    # constant deceleration of -scale over 0.9 s:
+    assert np.isclose(float(rows[0]["pf"]), 0.4 * (1.8 - 0.9))
+    assert np.isclose(float(rows[3]["impulse"]), 0.5 * -2 * 0.9)
+    assert rows[1]["error"] and not rows[0]["error"]
+    # every worker's stages are added up, the missing worksheet is read (and fails) but never gets to analyze_case:
+    stages = profiler.report()["stages"]
+    assert [stages[name]["calls"] for name in ("open_xl_file", "read_xl_data", "analyze_case")] == [2, 4, 3]
+    assert stages["analyze_case"]["samples"] == 30
+
+
+def test_analyze_workbook_non_finite(tmp_path):
+    workbook = str(tmp_path / "crash.xlsx")
+    db = xl.Database()
+    for worksheet, peak in (("Case 1", -2), ("Case 2", 1e308)):
+        db.add_ws(ws=worksheet)
+        for row in range(1, 11):
+            db.ws(worksheet).update_index(row=row, col=1, val=row / 10)
+            db.ws(worksheet).update_index(row=row, col=2, val=peak)
+    xl.writexl(db, workbook)
+
+    rows = analyze_workbook(workbook, [
+        {"worksheet": "Case 1", "mass": 0.4, "v0": 1.8, "padding": 0},
+        # a typo'd case table (float() reads "inf") and data that overflows the integration:
+        {"worksheet": "Case 1", "mass": float("inf"), "v0": 1.8, "padding": 0},
+        {"worksheet": "Case 2", "mass": 0.4, "v0": 1.8, "padding": 0},
+    ])
+
+    assert not rows[0].get("error") and np.isfinite(rows[0]["pf"])
+    for row in rows[1:]:
+        assert "non-finite" in row["error"] and "pf" not in row
+
+
+def test_decimate_minmax_keeps_extremes():
+    x = np.linspace(0, 1, 100_000)
+    y = np.sin(200 * x)
+    y[12_345] = 50.0
+    y[67_890] = -50.0
+
+    small_x, small_y = decimate_minmax(x, y, columns=500)
+
+    assert len(small_x) <= 2 * 500 + 2
+    assert small_y.max() == 50.0 and small_y.min() == -50.0
+    assert small_x[0] == 0 and small_x[-1] == 1 and np.all(np.diff(small_x) > 0)
+    assert decimate_minmax(x[:10], y[:10])[1].tolist() == y[:10].tolist()
+
+
+def test_headless_plotter(tmp_path):
+    plotter = HeadlessPlotter(str(tmp_path), "png", width=320, height=240)
+    x = np.linspace(0, 1, 10_000)
+
+    first = plotter.plot(x, np.sin(x), x, np.cos(x), "ACCELERATION of the vehicle VS TIME")
+    second = plotter.plot(x, x, x, -x, "VELOCITY of the vehicle VS TIME")
+
+    assert first.endswith("ACCELERATION_of_the_vehicle_VS_TIME.png")
+    assert (tmp_path / "VELOCITY_of_the_vehicle_VS_TIME.png").exists() and second != first
+    assert len(plotter.axes.lines) == 2
+
+
+def test_resample_uniform():
+    # unsorted, with a repeated time stamp and a blank row:
+    times = np.array([0.0, 0.3, 0.1, 0.1, np.nan, 0.4, 0.2])
+    accelerations = np.array([0.0, 3.0, 1.0, 9.0, 5.0, 4.0, 2.0])
+
+    grid, values, rate = resample_uniform(times, accelerations, sample_rate=20)
+
+    assert rate == 20 and np.allclose(grid, np.arange(9) * 0.05)
+    assert np.allclose(values, grid * 10)
+    assert np.isclose(resample_uniform(times, accelerations)[2], 10)
+
+
+def test_cfc_filter_matches_recursive_filter():
+    rate = 10_000
+    times = np.arange(0, 0.2, 1 / rate)
+    accelerations = np.random.default_rng(1).normal(0, 5, len(times)) - 30 * (times > 0.05)
+    filtered = cfc_filter(accelerations, rate, 60)
+
+    # reference: the J211 recursion run forward, then backward, over the same odd-reflected padding:
+    a0, a1, a2, b1, b2 = cfc_coefficients(60, rate)
+
+    def recursive(x):
+        y = np.zeros(len(x))
+        for n in range(2, len(x)):
+            y[n] = a0 * x[n] + a1 * x[n - 1] + a2 * x[n - 2] + b1 * y[n - 1] + b2 * y[n - 2]
+        return y
+
+    pad = 2000
+    padded = np.pad(accelerations, pad, mode="reflect", reflect_type="odd")
+    expected = recursive(recursive(padded)[::-1])[::-1][pad:-pad]
+    assert len(filtered) == len(accelerations)
+    assert np.allclose(filtered[100:-100], expected[100:-100], atol=1e-6)
+    # a constant goes through untouched, and the noise is mostly gone:
+    assert np.allclose(cfc_filter(np.full(50, -9.81), rate, 60), -9.81)
+    assert np.std(filtered[600:]) < 1.5 < np.std(accelerations[600:])
+
+
+def test_peak_and_impact_windows():
+    times = np.arange(11) / 10
+    accelerations = np.array([0.0, -0.5, -3, -10, -4, 0, 0, -2, -2, 1, 0])
+
+    assert peak_deceleration(times, accelerations) == (0.3, 10.0, 3)
+    assert impact_windows(accelerations, 0.2).tolist() == [[2, 5], [7, 9]]
+    assert impact_windows(np.ones(5)).shape == (0, 2)
+
+
+def test_condition_signal_feeds_integration():
+    # constant deceleration sampled unevenly, with noise:
+    rng = np.random.default_rng(2)
+    times = np.sort(rng.uniform(0, 0.5, 4000))
+    accelerations = -2.0 + rng.normal(0, 1, len(times))
+
+    clean_times, clean_accelerations = condition_signal(times, accelerations, cfc=60)
+
+    assert np.allclose(np.diff(clean_times), np.diff(clean_times)[0])
+    assert np.std(clean_accelerations) < 0.3
+    _, final_velocity = cumulative_integration(clean_times, clean_accelerations, initial_value=1.8)
+    _, pf, _ = analyze_case(times, accelerations, 0.4, 1.8, cfc=60)
+    assert np.isclose(pf, 0.4 * final_velocity)
+    assert np.isclose(final_velocity, 1.8 - 2.0 * 0.5, atol=0.05)
+
+
+def test_impulse_index_matches_integration():
+    times = np.sort(np.random.default_rng(3).uniform(0, 1, 500))
+    forces = -40 * np.exp(-((times - 0.3) / 0.05) ** 2) + np.sin(9 * times)
+    index = ImpulseIndex(times, forces)
+
+    assert np.isclose(index.total, numerical_integration(times, forces)[1])
+    # windows on sample times are exactly the integration of that slice:
+    assert np.isclose(index.impulse(times[50], times[300]), numerical_integration(times[50:301], forces[50:301])[1])
+    # windows between samples split the edge trapezoids at the linearly interpolated force:
+    t0, t1 = 0.2, 0.45
+    inside = (times > t0) & (times < t1)
+    x = np.concatenate(([t0], times[inside], [t1]))
+    fx = np.interp(x, times, forces)
+    assert np.isclose(index.impulse(t0, t1), numerical_integration(x, fx)[1])
+    assert np.isclose(index.impulse(t1, t0), -index.impulse(t0, t1))
+    assert index.impulse(-5, 5) == index.impulse(times[0], times[-1]) and isinstance(index.impulse(t0, t1), float)
+
+
+def test_impulse_index_windows():
+    times = np.arange(101) / 100
+    index = ImpulseIndex(times, np.where((times >= 0.4) & (times <= 0.5), -10.0, 0.0))
+
+    starts, impulses = index.sliding(0.05, np.array([0.0, 0.4, 0.45]))
+    assert np.allclose(impulses, [0.0, -0.5, -0.5])
+    assert np.allclose(index.impulse(np.array([0.0, 0.3]), np.array([1.0, 0.6])), [-1.1, -1.1])
+    start, impulse = index.peak(0.1)
+    assert np.isclose(start, 0.4) and np.isclose(impulse, -1.0)
+
+
+def test_stage_profiler():
+    off = StageProfiler()
+    with off.stage("read_xl_data") as stage:
+        stage["samples"] = 10
+    assert off.stages == {} and off.stage("a") is off.stage("b")
+
+    on = StageProfiler(enabled=True)
+    for _ in range(2):
+        with on.stage("numerical_integration", 1000):
+            np.cumsum(np.ones(1000))
+    stage = on.report()["stages"]["numerical_integration"]
+    assert stage["calls"] == 2 and stage["samples"] == 2000
+    assert stage["seconds"] > 0 and stage["samples_per_sec"] == 2000 / stage["seconds"]
+    assert stage["peak_memory_bytes"] >= 8000
+    on.stop()
+    assert not on.enabled and on.report()["stages"]["numerical_integration"] == stage
+
+
+def test_main_profile_report(tmp_path, monkeypatch):
+    workbook = str(tmp_path / "crash.xlsx")
+    db = xl.Database()
+    for worksheet in ("Case 1", "Case 2"):
+        db.add_ws(ws=worksheet)
+        for row in range(1, 42):
+            db.ws(worksheet).update_index(row=row, col=1, val="time" if row == 1 else (row - 2) / 100)
+            db.ws(worksheet).update_index(row=row, col=2, val="acceleration" if row == 1 else -float(row % 7))
+    xl.writexl(db, workbook)
+
+    # the environment variable turns profiling on just like --profile:
+    monkeypatch.setenv("DYNAMICS_PROFILE", str(tmp_path / "profile.json"))
+    main(["--workbook", workbook, "--headless", str(tmp_path / "charts"), "--cfc", "60", "--rate", "1000"])
+
+    with open(tmp_path / "profile.json") as file:
+        stages = json.load(file)["stages"]
+    assert list(stages) == ["open_xl_file", "read_xl_data", "condition_signal", "numerical_integration", "plot_data", "impulse"]
+    assert stages["read_xl_data"]["samples"] == 80 and stages["plot_data"]["calls"] == 3
+
+
+def test_rate_alone_resamples(tmp_path, monkeypatch):
+    workbook = str(tmp_path / "crash.xlsx")
+    db = xl.Database()
+    for worksheet in ("Case 1", "Case 2"):
+        db.add_ws(ws=worksheet)
+        for row in range(1, 42):
+            db.ws(worksheet).update_index(row=row, col=1, val="time" if row == 1 else (row - 2) / 100)
+            db.ws(worksheet).update_index(row=row, col=2, val="acceleration" if row == 1 else -float(row % 7))
+    xl.writexl(db, workbook)
+
+    monkeypatch.setenv("DYNAMICS_PROFILE", str(tmp_path / "profile.json"))
+    main(["--workbook", workbook, "--headless", str(tmp_path / "charts"), "--rate", "1000"])
+
+    with open(tmp_path / "profile.json") as file:
+        stages = json.load(file)["stages"]
+    # 0 to 0.39 s at 1000 Hz is 391 samples per case, instead of the 40 read:
+    assert stages["condition_signal"]["samples"] == 80 and stages["numerical_integration"]["samples"] == 2 * 391
+
+
+def test_batch_samples_after_conditioning(tmp_path):
+    workbook = str(tmp_path / "crash.xlsx")
+    times = np.array([0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.62, 0.64, 0.7, 0.8, 0.9]) / 1000  # 10 kHz, with a burst
+    db = xl.Database()
+    db.add_ws(ws="Case 1")
+    for row, time in enumerate(times, start=1):
+        db.ws("Case 1").update_index(row=row, col=1, val=float(time))
+        db.ws("Case 1").update_index(row=row, col=2, val=-2.0)
+    xl.writexl(db, workbook)
+
+    profiler = StageProfiler(True)
+    rows = analyze_workbook(workbook, [{"worksheet": "Case 1", "mass": 0.4, "v0": 1.8, "padding": 0, "cfc": 60}], profiler)
+    profiler.stop()
+
+    conditioned = len(condition_signal(times, np.full(len(times), -2.0), cfc=60)[0])
+    assert conditioned != len(times) and rows[0]["samples"] == conditioned
+    stages = profiler.report()["stages"]
+    assert stages["condition_signal"]["samples"] == len(times) and stages["analyze_case"]["samples"] == conditioned
+
+
+def test_impulse_index_repeated_times():
+    times = np.array([0.0, 0.1, 0.1, 0.2, 0.3, 0.3])
+    forces = np.array([1.0, 1.0, 3.0, 3.0, 3.0, 5.0])
+    index = ImpulseIndex(times, forces)
+
+    assert index.ordered and np.isclose(index.total, numerical_integration(times, forces)[1])
+    assert np.isclose(index.impulse(0.0, 0.3), index.total)
+    assert np.isclose(index.impulse(0.05, 0.15), 0.05 * 1.0 + 0.05 * 3.0)
+    assert np.all(np.isfinite(index.sliding(0.1)[1]))
+
+    # out of order data still has a total, like cumulative_integration, but no window lookups:
+    shuffled = ImpulseIndex(times[::-1], forces)
+    assert not shuffled.ordered and np.isclose(shuffled.total, cumulative_integration(times[::-1], forces)[1])
+    with raises(ValueError):
+        shuffled.impulse(0.0, 0.1)
+
+
+def test_run_batch_bad_workbook(tmp_path):
+    db = xl.Database()
+    db.add_ws(ws="Case 1")
+    for row in range(1, 6):
+        db.ws("Case 1").update_index(row=row, col=1, val=row / 10)
+        db.ws("Case 1").update_index(row=row, col=2, val=-1)
+    xl.writexl(db, str(tmp_path / "b.xlsx"))
+    (tmp_path / "a.xlsx").write_text("not a zip file")
+
+    cases = [{"workbook": "", "worksheet": "Case 1", "mass": 0.4, "v0": 1.8, "padding": 0}]
+    assert run_batch(str(tmp_path), cases, str(tmp_path / "results.csv"), workers=1) == 2
+
+    with open(tmp_path / "results.csv") as file:
+        rows = list(csv.DictReader(file))
+    assert rows[0]["error"].startswith("BadZipFile") and not rows[1]["error"]
+
+
+def test_xl_cache_unwritable(tmp_path):
+    workbook = str(tmp_path / "crash.xlsx")
+    db = xl.Database()
+    db.add_ws(ws="Case 1")
+    db.ws("Case 1").update_index(row=1, col=1, val=0.5)
+    db.ws("Case 1").update_index(row=1, col=2, val=-2)
+    xl.writexl(db, workbook)
+    # the cache folder can't be created inside a file:
+    (tmp_path / "file").write_text("")
+
+    times, accelerations = read_cached_data(load_xl_cache(workbook, cache_dir=str(tmp_path / "file" / "cache")), "Case 1")
+    assert times.tolist() == [0.5] and accelerations.tolist() == [-2]
+
+
+def test_main_impulse_matches_batch(tmp_path, capsys):
+    workbook = str(tmp_path / "crash.xlsx")
+    db = xl.Database()
+    for worksheet in ("Case 1", "Case 2"):
+        db.add_ws(ws=worksheet)
+        for row in range(1, 22):
+            db.ws(worksheet).update_index(row=row, col=1, val="time" if row == 1 else (row - 2) / 100)
+            db.ws(worksheet).update_index(row=row, col=2, val="acceleration" if row == 1 else -5.0 - row % 3)
+    xl.writexl(db, workbook)
+
+    main(["--workbook", workbook, "--headless", str(tmp_path / "charts")])
+    printed = float(capsys.readouterr().out.split("Total Impulse Case 1: ")[1].split()[0])
+
+    times, accelerations = read_cached_data(load_xl_cache(workbook), "Case 1", padding=1)
+    assert printed == round(analyze_case(times, accelerations, 0.4, 1.8)[2], 3)
+
+
+def test_cached_data_rejects_blank_and_text_cells(tmp_path):
+    workbook = str(tmp_path / "ragged.xlsx")
+    db = xl.Database()
+    db.add_ws(ws="Ragged")
+    db.add_ws(ws="Text")
+    for row in range(1, 6):
+        db.ws("Ragged").update_index(row=row, col=1, val=row / 10)
+        db.ws("Text").update_index(row=row, col=1, val=row / 10)
+        db.ws("Text").update_index(row=row, col=2, val="oops" if row == 3 else -1.0)
+    for row in range(1, 4):  # acceleration column is 2 cells short
+        db.ws("Ragged").update_index(row=row, col=2, val=-1.0)
+    xl.writexl(db, workbook)
+
+    xl_cache = load_xl_cache(workbook)
+    for worksheet in ("Ragged", "Text"):
+        with raises(ValueError):
+            read_xl_data(xl.readxl(workbook), worksheet)
+        with raises(ValueError):
+            read_cached_data(xl_cache, worksheet)
@@ -1,4 +1,5 @@
-from jar import Jar
+from jar import Jar, ConcurrentJar, ShardedJar
+import threading
 from pytest import raises
 
 
@@ -40,4 +41,83 @@ def test_withdraw():
 
     jar.deposit(3)
     jar.withdraw(2)
-    assert jar.size == 1
\ No newline at end of file
+    assert jar.size == 1
+
+def test_concurrent_jar():
+    jar = ConcurrentJar(5)
+    assert jar.capacity == 5 and jar.size == 0
+    assert jar.try_deposit(5) and not jar.try_deposit(1)
+    assert jar.try_withdraw(2) and not jar.try_withdraw(4)
+    assert str(jar) == "🍪🍪🍪"
+    with raises(ValueError):
+        jar.deposit(3)
+    with raises(ValueError):
+        jar.withdraw(4)
+    with raises(ValueError):
+        ConcurrentJar(-1)
+
+
+def test_concurrent_jar_threads():
+    jar = ConcurrentJar(3)
+
+    def work():
+        for _ in range(2000):
+            if jar.try_deposit(1):
+                jar.withdraw(1)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert jar.size == 0
+
+
+def test_concurrent_jar_waits():
+    jar = ConcurrentJar(2)
+    assert not jar.wait_withdraw(1, timeout=0.01)
+
+    threading.Timer(0.05, jar.deposit, args=(2,)).start()
+    assert jar.wait_withdraw(2, timeout=5)
+    assert jar.wait_deposit(2, timeout=0) and not jar.wait_deposit(1, timeout=0.01)
+    with raises(ValueError):
+        jar.wait_deposit(3)
+
+
+def test_concurrent_jar_apply():
+    jar = ConcurrentJar(10)
+    assert jar.apply([4, -1, 6]) == 9
+    with raises(ValueError):
+        jar.apply([1, 1])  # second step overfills, so neither is applied
+    assert jar.size == 9
+
+
+def test_sharded_jar():
+    jar = ShardedJar(10, shards=4)
+    assert jar.capacity == 10 and jar.size == 0 and jar.shards == 4
+    jar.deposit(9)  # more than one shard holds, so it's spread over the pool
+    assert jar.size == 9 and str(jar) == "🍪" * 9
+    assert not jar.try_deposit(2)
+    jar.withdraw(9)
+    assert jar.size == 0
+    with raises(ValueError):
+        jar.withdraw(1)
+
+
+def test_sharded_jar_threads():
+    jar = ShardedJar(8, shards=4)
+    jar.deposit(4)
+
+    def work():
+        for _ in range(2000):
+            if jar.try_withdraw(2):
+                jar.deposit(2)
+            if jar.try_deposit(1):
+                jar.withdraw(1)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert jar.size == 4 and jar.capacity == 8
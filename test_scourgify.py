@@ -0,0 +1,74 @@
+from scourgify import transform, find_shards, convert_file, convert_file_parallel, main
+from csv import writer
+from io import StringIO
+from pytest import raises, mark
+
+
+BEFORE = 'name,house\n"Abbott, Hannah",Hufflepuff\n"Bell, Katie",Gryffindor\n'
+
+
+def test_transform_file_objects():
+    fast, slow = StringIO(), StringIO()
+    assert transform(StringIO(BEFORE), fast) == 2
+    assert transform(StringIO(BEFORE), slow, fast=False) == 2
+    assert fast.getvalue() == slow.getvalue() == "first,last,house\r\nHannah,Abbott,Hufflepuff\r\nKatie,Bell,Gryffindor\r\n"
+
+
+def test_transform_iterables():
+    students = []
+    assert transform([("Abbott, Hannah", "Hufflepuff")], students) == 1
+    assert transform([{"name": "Bell, Katie", "house": "Gryffindor"}], students) == 1
+    assert students == [("Hannah", "Abbott", "Hufflepuff"), ("Katie", "Bell", "Gryffindor")]
+
+    sink = StringIO()
+    transform([("Gryffindor", "Bell, Katie")], writer(sink), fieldnames=["house", "name"])
+    assert sink.getvalue() == "Katie,Bell,Gryffindor\r\n"
+
+    with raises(ValueError):
+        transform(StringIO("first,house\nx,y\n"), [])
+
+
+def test_parallel_matches_serial(tmp_path):
+    before = tmp_path / "before.csv"
+    rows = "".join(f'"Last{i}, First{i}",House{i % 4}\n' for i in range(500))
+    before.write_text('name,house\n"Line\nBreak, Quoted ""Q""",Ravenclaw\n' + rows)
+
+    convert_file(str(before), str(tmp_path / "serial.csv"))
+    assert convert_file_parallel(str(before), str(tmp_path / "parallel.csv"), jobs=3) == 501
+    assert (tmp_path / "serial.csv").read_bytes() == (tmp_path / "parallel.csv").read_bytes()
+
+    shards = find_shards(str(before), 7)
+    assert len(shards) == 7
+    assert all(before.read_bytes()[start - 1:start] == b"\n" for start, _ in shards)
+
+
+def test_blank_lines_skipped(tmp_path):
+    before = tmp_path / "before.csv"
+    rows = "".join(f'"Last{i}, First{i}",House{i % 4}\n' + ("\n" if i % 50 == 0 else "") for i in range(200))
+    before.write_text('name,house\n\n' + rows + "\n\n")
+
+    assert convert_file(str(before), str(tmp_path / "serial.csv")) == 200
+    assert convert_file_parallel(str(before), str(tmp_path / "parallel.csv"), jobs=3) == 200
+    assert (tmp_path / "serial.csv").read_bytes() == (tmp_path / "parallel.csv").read_bytes()
+    assert (tmp_path / "serial.csv").read_text().splitlines()[1] == "First0,Last0,House0"
+
+
+def test_parallel_uses_serial_encoding(tmp_path):
+    before = tmp_path / "before.csv"
+    # "é" in latin-1 isn't valid UTF-8, so both paths must decode with the encoding they're given:
+    rows = "".join(f'"Last{i}, Andr\u00e9{i}",House{i % 4}\n' for i in range(300))
+    before.write_text("name,house\n" + rows, encoding="latin-1")
+
+    assert convert_file(str(before), str(tmp_path / "serial.csv"), encoding="latin-1") == 300
+    assert convert_file_parallel(str(before), str(tmp_path / "parallel.csv"), jobs=3, encoding="latin-1") == 300
+    assert (tmp_path / "serial.csv").read_bytes() == (tmp_path / "parallel.csv").read_bytes()
+    assert (tmp_path / "serial.csv").read_text(encoding="latin-1").splitlines()[1] == "Andr\u00e90,Last0,House0"
+
+
+@mark.parametrize("option", ["--jobs=0", "--jobs=-1"])
+def test_jobs_must_be_positive(tmp_path, monkeypatch, option):
+    before = tmp_path / "before.csv"
+    before.write_text(BEFORE)
+    monkeypatch.setattr("scourgify.argv", ["scourgify.py", str(before), str(tmp_path / "after.csv"), option])
+    with raises(SystemExit, match="--jobs must be a positive whole number"):
+        main()
@@ -0,0 +1,33 @@
+from seasons import nums_to_words, inflect_engine, minutes_alive_many, get_minutes
+from datetime import date
+from random import Random
+
+
+def test_nums_to_words_matches_inflect():
+    engine = inflect_engine()
+    random = Random(2024)
+    numbers = list(range(0, 2100)) + [10**k + d for k in range(3, 15) for d in (-1, 0, 1, 10, 99, 100, 101)]
+    numbers += [random.randrange(10**digits) for digits in range(4, 16) for _ in range(300)]
+    for number in numbers:
+        assert nums_to_words(number) == engine.number_to_words(number, andword=""), number
+
+
+def test_nums_to_words_outside_tables():
+    engine = inflect_engine()
+    for number in (-5, 10**15, 10**18 + 7):
+        assert nums_to_words(number) == engine.number_to_words(number, andword="")
+
+
+def test_minutes_alive_many():
+    today = date(2024, 4, 21)
+    dates = ["2000-01-01", "1990-1-1", "2023-02-29", "2024-02-29", "January 1, 2019", "1934-01-01 ", "0000-01-01", "1934-01-01"]
+
+    minutes, errors = minutes_alive_many(iter(dates), today=today)
+
+    assert errors == [None, "Invalid date", "Invalid date", None, "Invalid date", "Invalid date", "Invalid date", None]
+    for text, value, error in zip(dates, minutes.tolist(), errors):
+        if error is None:
+            assert value == get_minutes(today - date.fromisoformat(text))
+        else:
+            assert value == 0
+    assert minutes_alive_many([], today=today)[1] == []
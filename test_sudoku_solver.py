@@ -0,0 +1,237 @@
+from sudoku_solver import fill_board, solve_board, parse_puzzle, format_board, solve_file, latency_percentiles
+from sudoku_solver import count_solutions, dlx_fill_board, iter_solutions, FlatBoard, find_empty_cell, validate_input
+from sudoku_solver import generate_puzzle, DIFFICULTIES, generate_main, _BitmaskSolver
+from sudoku_solver import canonical_form, SolutionCache, _from_canonical
+from pytest import raises
+import random
+
+
+HARD = "800000000003600000070090200050007000000045700000100030001000068008500010090000400"
+EASY = "518600400006000007430200006700000030064018205050726948009001823021000700300040069"
+
+
+def to_board(puzzle):
+    return [[int(puzzle[row * 9 + col]) for col in range(9)] for row in range(9)]
+
+
+def is_solution(board, puzzle):
+    digits = list(range(1, 10))
+    return (
+        all(sorted(row) == digits for row in board)
+        and all(sorted(col) == digits for col in zip(*board))
+        and all(
+            sorted(board[row][col] for row in range(r, r + 3) for col in range(c, c + 3)) == digits
+            for r in (0, 3, 6)
+            for c in (0, 3, 6)
+        )
+        and all(given in ("0", str(board[i // 9][i % 9])) for i, given in enumerate(puzzle))
+    )
+
+
+def test_solve_board_matches_fill_board():
+    board, expected = to_board(EASY), to_board(EASY)
+    assert solve_board(board)
+    assert fill_board(expected)
+    assert board == expected
+
+
+def test_solve_board_hard():
+    board = to_board(HARD)
+    assert solve_board(board)
+    assert is_solution(board, HARD)
+
+
+def test_solve_board_invalid():
+    board = to_board(HARD)
+    board[0][1] = 8  # same digit twice in the first row
+    assert not solve_board(board)
+    assert board == [[8, 8] + [0] * 7] + to_board(HARD)[1:]
+
+
+def test_parse_and_format():
+    assert format_board(parse_puzzle(HARD)) == HARD
+    assert parse_puzzle(HARD.replace("0", ".")) == to_board(HARD)
+    with raises(ValueError):
+        parse_puzzle(HARD[:80])
+
+
+def test_solve_file(tmp_path):
+    puzzles, solutions = tmp_path / "puzzles.txt", tmp_path / "solutions.txt"
+    puzzles.write_text(f"{HARD}\n\nnot a puzzle\n{EASY}\n" * 3)
+
+    report = solve_file(str(puzzles), str(solutions), processes=2, chunk_size=2)
+
+    lines = solutions.read_text().splitlines()
+    assert report["puzzles"] == 9 and report["solved"] == 6
+    assert [bool(line) for line in lines] == [True, False, True] * 3
+    assert is_solution(to_board(lines[0]), HARD) and is_solution(to_board(lines[2]), EASY)
+    assert report["p50"] <= report["p90"] <= report["p99"]
+
+
+def test_latency_percentiles():
+    assert latency_percentiles(list(range(1, 101))) == {50: 50, 90: 90, 99: 99}
+    assert latency_percentiles([]) == {}
+
+
+def test_count_solutions():
+    assert count_solutions(to_board(HARD)) == 1
+    assert count_solutions([[0] * 9 for _ in range(9)]) == 2
+    assert count_solutions([[0] * 9 for _ in range(9)], limit=50) == 50
+    clash = to_board(HARD)
+    clash[0][1] = 8
+    assert count_solutions(clash) == 0
+
+
+def test_dlx_matches_solve_board():
+    board, expected = to_board(HARD), to_board(HARD)
+    assert dlx_fill_board(board) and solve_board(expected)
+    assert board == expected
+    assert next(iter_solutions(to_board(HARD))) == board
+
+
+def test_dlx_16x16():
+    board = [[0] * 16 for _ in range(16)]
+    assert dlx_fill_board(board)
+    digits = list(range(1, 17))
+    assert all(sorted(row) == digits for row in board)
+    assert all(sorted(col) == digits for col in zip(*board))
+    assert all(
+        sorted(board[row][col] for row in range(r, r + 4) for col in range(c, c + 4)) == digits
+        for r in range(0, 16, 4)
+        for c in range(0, 16, 4)
+    )
+    # a full valid board is its own unique solution, removing one clue keeps it unique:
+    board[5][7] = 0
+    assert count_solutions(board) == 1
+
+
+def test_dlx_invalid_shape():
+    with raises(ValueError):
+        count_solutions([[0] * 8 for _ in range(8)])
+
+
+def test_flat_board_round_trip():
+    flat = FlatBoard.from_line(HARD)
+    assert len(flat.cells) == 81
+    assert flat.to_line() == HARD
+    assert flat.to_lists() == to_board(HARD)
+    assert FlatBoard.from_lists(to_board(HARD)) == flat
+    assert flat[0, 0] == 8 and flat[10] == flat[1, 1] == 0
+
+    copy = flat.copy()
+    copy[0, 1] = 1
+    assert flat[0, 1] == 0 and copy != flat
+
+    # only 9 x 9 boards have a line form, other sizes round-trip through lists:
+    big = FlatBoard(16)
+    big[0, 0] = 16
+    assert FlatBoard.from_lists(big.to_lists()) == big
+    with raises(ValueError):
+        big.to_line()
+    with raises(ValueError):
+        FlatBoard.from_line(HARD + "0" * 175)
+
+
+def test_flat_board_hot_paths_match_lists():
+    board, flat = to_board(HARD), FlatBoard.from_line(HARD)
+    row, col = find_empty_cell(board)
+    assert flat.find_empty() == row * 9 + col
+    for cell in range(81):
+        for digit in range(1, 10):
+            assert flat.is_valid_move(cell, digit) == validate_input(board, (cell // 9, cell % 9), digit)
+
+
+def test_solve_flat_board():
+    flat = FlatBoard.from_line(HARD)
+    assert solve_board(flat)
+    assert flat.find_empty() == -1
+    assert is_solution(flat.to_lists(), HARD)
+
+
+def test_generate_puzzle_unique():
+    for difficulty, (fewest_clues, singles_only) in DIFFICULTIES.items():
+        for seed in range(3):
+            puzzle, solution = generate_puzzle(difficulty, seed)
+            board = to_board(puzzle)
+            assert count_solutions(board) == 1
+            assert is_solution(to_board(solution), puzzle)
+            assert fewest_clues <= 81 - puzzle.count("0") < 81
+
+            # easy and medium fall to singles alone, hard needs at least one guess:
+            solver = _BitmaskSolver(FlatBoard.from_line(puzzle))
+            assert (solver.propagate() == (None, 0)) == singles_only
+
+
+def test_generate_puzzle_repeatable():
+    assert generate_puzzle("hard", 7) == generate_puzzle("hard", 7)
+    assert generate_puzzle("easy", 7) != generate_puzzle("easy", 8)
+    with raises(ValueError):
+        generate_puzzle("impossible")
+
+
+def test_generate_main(tmp_path):
+    output = tmp_path / "puzzles.txt"
+    generate_main(["3", "--difficulty", "easy", "--seed", "1", "--output", str(output)])
+    lines = output.read_text().splitlines()
+    assert len(lines) == 3 and all(len(line) == 81 and count_solutions(to_board(line)) == 1 for line in lines)
+
+
+def equivalent(puzzle, rng):
+    # a random member of the puzzle's symmetry class:
+    board = to_board(puzzle)
+    for _ in range(rng.randrange(4)):  # rotate 90 degrees
+        board = [list(row) for row in zip(*board[::-1])]
+    if rng.random() < 0.5:  # mirror
+        board = [row[::-1] for row in board]
+    rows = [band * 3 + row for band in rng.sample(range(3), 3) for row in rng.sample(range(3), 3)]
+    cols = [stack * 3 + col for stack in rng.sample(range(3), 3) for col in rng.sample(range(3), 3)]
+    digits = [0] + rng.sample(range(1, 10), 9)
+    return "".join(str(digits[board[row][col]]) for row in rows for col in cols)
+
+
+def test_canonical_form_is_symmetry_invariant():
+    rng = random.Random(0)
+    for puzzle in (HARD, EASY):
+        key, transform = canonical_form(FlatBoard.from_line(puzzle))
+        assert _from_canonical(key, transform) == puzzle
+        for _ in range(20):
+            variant = equivalent(puzzle, rng)
+            assert canonical_form(FlatBoard.from_line(variant))[0] == key
+    assert canonical_form(FlatBoard.from_line(HARD))[0] != canonical_form(FlatBoard.from_line(EASY))[0]
+    # no structure to go on, the board is its own key:
+    assert canonical_form(FlatBoard())[0] == "0" * 81
+
+
+def test_solution_cache_maps_hits_back():
+    rng = random.Random(1)
+    cache = SolutionCache()
+    variants = [HARD] + [equivalent(HARD, rng) for _ in range(10)]
+    for variant in variants:
+        assert is_solution(to_board(cache.solve(variant)), variant)
+    assert (cache.misses, cache.hits) == (1, 10)
+    assert cache.solve("not a puzzle") == ""
+    clash = "88" + HARD[2:]
+    assert cache.solve(clash) == "" and cache.solve(clash[::-1]) == "" and cache.hits == 11
+
+
+def test_solution_cache_lru_and_disk(tmp_path):
+    cache = SolutionCache(maxsize=1, path=str(tmp_path / "solutions"))
+    cache.solve(HARD)
+    cache.solve(EASY)
+    assert len(cache.entries) == 1
+    cache.solve(HARD)  # evicted from memory, still on disk
+    assert cache.hits == 1 and cache.misses == 2
+    cache.close()
+
+    with SolutionCache(path=str(tmp_path / "solutions")) as reopened:
+        assert is_solution(to_board(reopened.solve(EASY[::-1])), EASY[::-1])
+        assert reopened.misses == 0
+
+
+def test_solve_file_with_cache(tmp_path):
+    puzzles, solutions = tmp_path / "puzzles.txt", tmp_path / "solutions.txt"
+    puzzles.write_text(f"{HARD}\n{HARD[::-1]}\nnot a puzzle\n{EASY}\n")
+    report = solve_file(str(puzzles), str(solutions), cache=SolutionCache())
+    lines = solutions.read_text().splitlines()
+    assert report["solved"] == 3 and report["cache_hits"] == 1
+    assert is_solution(to_board(lines[1]), HARD[::-1]) and lines[2] == ""
@@ -1,4 +1,7 @@
-from watch import parse
+from watch_youtube import parse, extract_urls, crawl, crawl_main, list_pages, BloomFilter
+from pytest import raises
+import asyncio
+from io import BytesIO, StringIO
 
 
 def test_short_html():
@@ -21,3 +24,89 @@ def test_no_src():
         )
         == None
     )
+
+
+PAGE = (
+    '<p>intro</p><iframe src="http://youtube.com/embed/aaaaaaaaaaa"></iframe>'
+    + "<div>" * 50
+    + '<iframe src="https://www.youtube.com/embed/bbbbbbbbbbb?start=3" title="x"></iframe>'
+    + '<iframe src="https://cs50.harvard.edu/python"></iframe>'
+    + '<iframe width="560" src="https://youtube.com/embed/ccccccccccc"></iframe>'
+)
+URLS = ["https://youtu.be/aaaaaaaaaaa", "https://youtu.be/bbbbbbbbbbb?start=3", "https://youtu.be/ccccccccccc"]
+
+
+def test_extract_every_url():
+    assert list(extract_urls(PAGE)) == URLS
+    assert list(extract_urls(PAGE.encode())) == URLS
+    assert list(extract_urls(memoryview(PAGE.encode()))) == URLS
+    assert list(extract_urls("<p>no videos</p>")) == []
+
+
+def test_extract_across_chunk_boundaries():
+    # every chunk size splits some src="..." in a different place:
+    for chunk_size in (1, 2, 7, 13, 64, 1000):
+        assert list(extract_urls(StringIO(PAGE), chunk_size)) == URLS
+        assert list(extract_urls(BytesIO(PAGE.encode()), chunk_size)) == URLS
+
+
+def test_crawl_pipeline(tmp_path):
+    for index in range(12):
+        (tmp_path / f"page{index}.html").write_text(PAGE if index % 2 else f'<iframe src="https://youtube.com/embed/id{index}"></iframe>')
+    (tmp_path / "notes.txt").write_text(PAGE)
+    (tmp_path / "manifest.txt").write_text("page0.html\npage1.html\nmissing.html\n")
+
+    output = StringIO()
+    stats = asyncio.run(crawl(list_pages(str(tmp_path)), output, readers=3, workers=2, queue_size=2))
+    assert stats == {"pages": 12, "urls": 24, "unique": 9, "errors": 0}
+    assert sorted(line.split("\t")[0] for line in output.getvalue().splitlines()) == sorted(
+        URLS + [f"https://youtu.be/id{index}" for index in range(0, 12, 2)]
+    )
+
+    stats = asyncio.run(crawl(list_pages(str(tmp_path / "manifest.txt")), StringIO(), readers=2, workers=1))
+    assert stats == {"pages": 2, "urls": 4, "unique": 4, "errors": 1}
+
+
+def test_crawl_slow_async_sink(tmp_path):
+    for index in range(20):
+        (tmp_path / f"{index}.html").write_text(f'<iframe src="https://youtube.com/embed/v{index}"></iframe>')
+
+    class SlowSink:
+        lines = []
+
+        async def write(self, line):
+            await asyncio.sleep(0.001)
+            self.lines.append(line)
+
+    seen = BloomFilter(1000)
+    stats = asyncio.run(crawl(list_pages(str(tmp_path)), SlowSink(), readers=4, workers=1, queue_size=1, seen=seen))
+    assert stats["unique"] == len(SlowSink.lines) == 20
+    assert seen.add("v3") and not seen.add("never-seen")
+
+
+def test_crawl_non_utf8_page(tmp_path):
+    (tmp_path / "a.html").write_bytes(b'<iframe src="https://youtube.com/embed/bad\xffid"></iframe>')
+    (tmp_path / "b.html").write_bytes(b'<iframe src="https://youtube.com/embed/goodid"></iframe>')
+
+    assert list(extract_urls((tmp_path / "a.html").read_bytes())) == ["https://youtu.be/bad�id"]
+    output = StringIO()
+    stats = asyncio.run(crawl(list_pages(str(tmp_path)), output, readers=2, workers=1))
+    assert stats == {"pages": 2, "urls": 2, "unique": 2, "errors": 0}
+    assert "https://youtu.be/goodid\t" in output.getvalue()
+
+
+def test_list_pages_is_lazy(tmp_path):
+    for folder in ("b", "a"):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "page.html").write_text(PAGE)
+    (tmp_path / "index.htm").write_text(PAGE)
+
+    pages = list_pages(str(tmp_path))
+    # nothing is walked until the crawl asks for the first page:
+    assert iter(pages) is pages
+    assert next(pages) == str(tmp_path / "index.htm")
+    assert list(pages) == [str(tmp_path / "a" / "page.html"), str(tmp_path / "b" / "page.html")]
+
+    # the source is checked before the crawl starts:
+    with raises(SystemExit, match="Could not read"):
+        crawl_main([str(tmp_path / "missing.txt"), str(tmp_path / "out.txt")])
@@ -1,4 +1,5 @@
-from working import convert
+from working import convert, convert_many, convert_regex
+from random import Random
 from pytest import raises
 
 
@@ -19,3 +20,54 @@ def test_invalid():
         convert("9 AM - 5 PM")
     with raises(ValueError):
         convert("09:00 AM - 17:00 PM")
+
+
+def test_convert_many():
+    results = list(convert_many(["9 AM to 5 PM", " 9 AM to 5 PM ", "9:60 AM to 5:60 PM", "10:30 PM to 8:50 AM"]))
+    assert results[0] == results[1] == ("09:00 to 17:00", None)
+    assert results[2][0] is None and isinstance(results[2][1], ValueError)
+    assert results[3] == ("22:30 to 08:50", None)
+
+
+def test_convert_many_bad_rows():
+    results = list(convert_many(["9:60 AM to 5:60 PM", None, 9, "9:60 AM to 5:60 PM", "9 AM to 5 PM"]))
+    assert all(result is None and isinstance(error, ValueError) for result, error in results[:4])
+    # a cached failure still gets a fresh exception per row:
+    assert str(results[0][1]) == str(results[3][1]) and results[0][1] is not results[3][1]
+    assert results[4] == ("09:00 to 17:00", None)
+
+
+CASES = [
+    "9 AM to 5 PM", "10 PM to 8 AM", "9:00 AM to 5:00 PM", "10:30 PM to 8:50 AM", "12 AM to 12 PM", "12:00 PM to 12:00 AM",
+    "9:60 AM to 5:60 PM", "9 AM - 5 PM", "09:00 AM - 17:00 PM", "13 AM to 5 PM", "0 AM to 5 PM", "  9 AM to 5 PM  ",
+    "9 AM to 5 PM!", "at 9 AM to 5 PM", "109 AM to 5 PM", "930 AM to 5 PM", "9 AM to 5:30 PM", "9 am to 5 pm", "",
+]
+
+
+def outcome(function, s):
+    try:
+        return function(s)
+    except ValueError:
+        return ValueError
+    except TypeError:
+        return TypeError
+
+
+def test_scanner_matches_regex():
+    for s in CASES:
+        assert outcome(convert, s) == outcome(convert_regex, s), s
+
+
+def test_scanner_matches_regex_random():
+    random = Random(50)
+    pieces = ["9", "12", "0", "1", "30", ":", "00", " ", "AM", "PM", " to ", "x", "60"]
+    for _ in range(20000):
+        s = "".join(random.choice(pieces) for _ in range(random.randint(1, 12)))
+        assert outcome(convert, s) == outcome(convert_regex, s), s
+    for _ in range(5000):
+        times = [
+            f"{random.randint(0, 13)}{random.choice(['', ':00', ':30', ':59', ':60', ':5'])} {random.choice(['AM', 'PM'])}"
+            for _ in range(2)
+        ]
+        s = random.choice(["", " ", "x"]) + " to ".join(times) + random.choice(["", " ", "x"])
+        assert outcome(convert, s) == outcome(convert_regex, s), s
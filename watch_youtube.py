@@ -22,7 +22,24 @@ TODO: implement a function called parse...
     And assume that the input will contain no more than one such URL.
     If the input does not contain any such URL at all, return None.
 """
+import argparse
+import asyncio
+import hashlib
+import inspect
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from math import log
+
+# longest video path accepted after /embed/, so a chunked scan only ever has to hold back this much:
+MAX_PATH = 2048
+# every embedded YouTube src, same rule as parse: the path runs up to the closing quote, on one line.
+EMBED = r'src="https?://(?:www\.)?youtube\.com/embed/([^"\n]{1,%d})"' % MAX_PATH
+EMBED_STR = re.compile(EMBED)
+EMBED_BYTES = re.compile(EMBED.encode())
+# a match that hasn't been closed yet can be at most this long:
+MAX_MATCH = len('src="https://www.youtube.com/embed/') + MAX_PATH + 1
 
 
 def main():
@@ -44,5 +61,194 @@ def parse(s):
         return None
 
 
+def extract_urls(html, chunk_size: int = 1 << 16):
+    """
+    Yields the youtu.be link of every embedded YouTube URL, in page order, without ever holding the whole page.
+
+    :param html: a str, bytes or memoryview of HTML (scanned in place, no copy),
+                 or a text or binary file object, read chunk_size at a time
+    :param chunk_size: characters (or bytes) read per chunk from a file object
+    :return: generator of "https://youtu.be/..." strings
+    """
+    # whole buffers are scanned as they are:
+    if isinstance(html, str):
+        chunks, pattern = [html], EMBED_STR
+    elif isinstance(html, (bytes, bytearray, memoryview)):
+        chunks, pattern = [html], EMBED_BYTES
+    else:
+        chunks = iter(lambda: html.read(chunk_size), html.read(0))  # read until an empty str / bytes
+        pattern = None
+
+    tail = None
+    for chunk in chunks:
+        if pattern is None:
+            pattern = EMBED_BYTES if isinstance(chunk, bytes) else EMBED_STR
+        # anything held back from the last chunk goes in front, so a src split across two chunks is still found:
+        buffer = tail + chunk if tail else chunk
+        end = 0
+        for match in pattern.finditer(buffer):
+            path = match.group(1)
+            # a stray non-UTF-8 byte in an archived page becomes U+FFFD instead of failing the whole page:
+            yield "https://youtu.be/" + (path if isinstance(path, str) else bytes(path).decode(errors="replace"))
+            end = match.end()
+        # hold back only what could still be the start of an unfinished match:
+        tail = buffer[max(end, len(buffer) - MAX_MATCH + 1) :]
+
+
+def video_id(url: str) -> str:
+    # the video id is the youtu.be path without any ?query:
+    return url.removeprefix("https://youtu.be/").split("?", 1)[0]
+
+
+class BloomFilter:
+    """
+    Fixed-size set of strings for deduplicating more video ids than fit in a set: memory never grows,
+    "not seen" answers are always right, "seen" answers are wrong with probability error_rate (so a few new ids can be dropped).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        # standard sizing: bits = -n ln(p) / ln(2)^2, hashes = bits / n * ln(2):
+        self.bits = max(8, int(-capacity * log(error_rate) / log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * log(2)))
+        self.array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, item: str):
+        # double hashing, two 64-bit halves of one blake2b digest make every position:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, item: str) -> bool:
+        # adds the item, returns True if it (probably) was already there:
+        seen = True
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.array[byte] >> bit & 1:
+                seen = False
+                self.array[byte] |= 1 << bit
+        return seen
+
+
+def _extract_page(path: str) -> list:
+    # runs on a worker process, so it has to be a module-level function.
+    # the worker opens and streams the file itself, so pages are never read whole or pickled over from the parent:
+    with open(path, "rb") as file:
+        return list(extract_urls(file))
+
+
+def list_pages(source: str):
+    """
+    The HTML files to crawl, yielded lazily so the crawl starts on the first page instead of after a full walk:
+    every .htm/.html file under a folder (each folder's files and subfolders in name order),
+    or the paths listed one per line in a manifest file (relative paths are relative to the manifest).
+    """
+    if os.path.isdir(source):
+        for folder, folders, names in os.walk(source):
+            folders.sort()  # in place, so os.walk descends in name order too
+            for name in sorted(names):
+                if name.lower().endswith((".htm", ".html")):
+                    yield os.path.join(folder, name)
+        return
+    base = os.path.dirname(source)
+    with open(source) as manifest:
+        for line in manifest:
+            if line := line.strip():
+                yield os.path.join(base, line)
+
+
+async def crawl(pages, sink, readers: int = 8, workers: int = None, queue_size: int = 64, seen=None):
+    """
+    Extracts every YouTube embed from many HTML files with an asyncio pipeline:
+        pages -> [readers tasks, bounded concurrency] -> [process pool reads files and extracts urls] -> [writer dedupes and writes]
+    The stages are joined by bounded queues, so a slow sink stalls the readers instead of piling pages up in memory,
+    and pages is only consumed as fast as the readers keep up (a generator like list_pages is never run ahead).
+
+    :param pages: iterable of HTML file paths
+    :param sink: where "url<TAB>page" lines go, anything with write() (a file, or an object whose write is a coroutine)
+    :param readers: how many files are read (and extracted) at the same time
+    :param workers: process pool size, defaults to the number of cores
+    :param queue_size: how many items each queue holds before it pushes back
+    :param seen: video ids already written, a set (default) or a BloomFilter for bounded memory; shared across calls if given
+    :return: counts of pages, urls found, unique urls written and pages that couldn't be read or extracted
+    :rtype: dict
+    """
+    loop = asyncio.get_running_loop()
+    seen = set() if seen is None else seen
+    paths, results = asyncio.Queue(queue_size), asyncio.Queue(queue_size)
+    stats = {"pages": 0, "urls": 0, "unique": 0, "errors": 0}
+    write_is_async = inspect.iscoroutinefunction(sink.write)
+
+    async def produce():
+        for path in pages:
+            await paths.put(path)  # waits while the readers are behind
+        for _ in range(readers):
+            await paths.put(None)  # one stop signal per reader
+
+    async def read(pool):
+        while (path := await paths.get()) is not None:
+            try:
+                urls = await loop.run_in_executor(pool, _extract_page, path)
+            except Exception:
+                stats["errors"] += 1  # one missing, unreadable or bad page doesn't stop the crawl
+                continue
+            stats["pages"] += 1
+            await results.put((path, urls))  # waits while the writer is behind
+        await results.put(None)
+
+    async def write():
+        finished = 0
+        while finished < readers:
+            if (item := await results.get()) is None:
+                finished += 1
+                continue
+            path, urls = item
+            for url in urls:
+                stats["urls"] += 1
+                identity = video_id(url)
+                # a set answers membership, a BloomFilter's add answers "was it there already":
+                if isinstance(seen, set):
+                    if identity in seen:
+                        continue
+                    seen.add(identity)
+                elif seen.add(identity):
+                    continue
+                stats["unique"] += 1
+                line = f"{url}\t{path}\n"
+                if write_is_async:
+                    await sink.write(line)
+                else:
+                    sink.write(line)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        await asyncio.gather(produce(), write(), *(read(pool) for _ in range(readers)))
+    return stats
+
+
+def crawl_main(argv: list):
+    """
+    Command-line entry point for crawling:
+        python watch_youtube.py crawl <folder or manifest> <output file> [--readers N] [--workers N] [--bloom CAPACITY]
+    """
+    parser = argparse.ArgumentParser(prog="watch_youtube.py crawl", description="Extract YouTube embeds from many HTML files.")
+    parser.add_argument("source", help="folder of .html files, or a manifest with one path per line")
+    parser.add_argument("output", help="file to write url<TAB>page lines to")
+    parser.add_argument("--readers", type=int, default=8, help="files read at the same time")
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes (default: all cores)")
+    parser.add_argument("--bloom", type=int, default=None, metavar="CAPACITY", help="dedupe with a Bloom filter sized for this many ids instead of a set")
+    args = parser.parse_args(argv)
+
+    # list_pages is lazy, so check the source before the crawl starts:
+    if not os.path.exists(args.source):
+        sys.exit(f"Could not read {args.source}")
+    pages = list_pages(args.source)
+    seen = BloomFilter(args.bloom) if args.bloom else None
+    with open(args.output, "w") as output:
+        stats = asyncio.run(crawl(pages, output, args.readers, args.workers, seen=seen))
+    print(f"{stats['pages']} pages, {stats['urls']} urls, {stats['unique']} unique, {stats['errors']} unreadable")
+
+
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["crawl"]:
+        crawl_main(sys.argv[2:])
+    else:
+        main()
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 """
 Implement a function that:
@@ -8,14 +9,30 @@ Implement a function that:
     Expect that AM and PM will be capitalized (with no periods therein) and that there will be a space before each
 """
 
+# compiled once at import, instead of on every call:
+TIME_RANGE = re.compile(r"(\d{1,2}):?(\d{2})? (AM|PM) to (\d{1,2}):?(\d{2})? (AM|PM)")
+# how many distinct inputs convert_many remembers:
+CACHE_SIZE = 4096
+
 
 def main():
     print(convert(input("Hours: ")))
 
 
 def convert(s):
+    # FAST PATH: hand-written scanner for the two accepted formats, no regex or match objects:
+    s = s.strip()
+    if " to " not in s:
+        raise ValueError  # the regex needs " to " too, so this can never be valid
+    if (times := scan(s)) is None:
+        # anything the scanner doesn't recognize as a whole goes to the regex, which also accepts a match anywhere in the string:
+        return convert_regex(s)
+    return to_24_hour(*times)
+
+
+def convert_regex(s):
     # check if the given time's FORMAT is valid:
-    if not (time := re.search(r"(\d{1,2}):?(\d{2})? (AM|PM) to (\d{1,2}):?(\d{2})? (AM|PM)", s.strip())):
+    if not (time := TIME_RANGE.search(s.strip())):
         raise ValueError # if the input to convert is not in either of acceptable formats, raise ValueError:
 
     # NOW >> get components of both times:
@@ -26,13 +43,45 @@ def convert(s):
     else:
         start_minute, end_minute = int(time.group(2)), int(time.group(5))
 
+    return to_24_hour(start_hour, start_minute, time.group(3), end_hour, end_minute)
+
+
+def scan(s):
+    """
+    Table-driven scan of a stripped string in exactly one of the accepted formats, with in-range numbers:
+        9:00 AM to 5:00 PM
+        9 AM to 5 PM
+    Returns (start_hour, start_minute, start AM/PM, end_hour, end_minute), or None if s isn't exactly one of them.
+    None doesn't mean invalid, only that the regex has to decide.
+    """
+    start, _, end = s.partition(" to ")
+    # one dict lookup per time both checks the format and converts the numbers:
+    if (start := _TIMES.get(start)) is None or (end := _TIMES.get(end)) is None:
+        return None
+    # both times must be in the same format:
+    if (start[1] is None) != (end[1] is None):
+        return None
+    return start[0], start[1] or 0, start[2], end[0], end[1] or 0
+
+
+# every valid "9 AM", "09 AM", "9:05 AM"... (also PM) -> (hour, minute or None, "AM" or "PM"), about 2,500 entries:
+_TIMES = {
+    f"{hour}{minute} {meridiem}": (value, None if not minute else int(minute[1:]), meridiem)
+    for hours in range(1, 13)
+    for hour, value in {str(hours): hours, f"{hours:02}": hours}.items()
+    for minute in ["", *(f":{m:02}" for m in range(60))]
+    for meridiem in ("AM", "PM")
+}
+
+
+def to_24_hour(start_hour, start_minute, meridiem, end_hour, end_minute):
     # MUST check if either time is invalid (e.g., 12:60 AM, 13:00 PM, etc.):
     if not (1 <= start_hour <= 12 and 0 <= start_minute < 60) or not (1 <= end_hour <= 12 and 0 <= end_minute < 60):
         raise ValueError
 
     # NOW >> convert PM components to 24-hr format
     # CASE 1: when it's AM to PM
-    if time.group(3) == "AM":
+    if meridiem == "AM":
         # add 12 to convert to 24hr format. But, if it's 12 PM or 12:00 PM, leave it unchanged
         end_hour += (12 if end_hour != 12 else 0)  # 12 PM (or 12:00 PM) is just 12:00 so don't change
         start_hour %= 12 # this makes sure that 12:00 AM (or 12 AM) is converted to 0:00
@@ -46,5 +95,32 @@ def convert(s):
     return f"{start_hour:02}:{start_minute:02} to {end_hour:02}:{end_minute:02}"
 
 
+# converts an already stripped string, remembering both results and failures of the most recent CACHE_SIZE distinct inputs.
+# Failures are cached as their message only, an exception instance carries a traceback and must not be shared between rows:
+@lru_cache(maxsize=CACHE_SIZE)
+def _convert_cached(s):
+    try:
+        return convert(s), None
+    except ValueError:
+        return None, f"invalid time range: {s!r}"
+
+
+def convert_many(strings):
+    """
+    Converts many time ranges lazily, one (result, error) pair per input, in order:
+        ("09:00 to 17:00", None) for a valid input
+        (None, ValueError) for an invalid one (also for a row that isn't a str at all), so one bad row doesn't abort the whole batch
+    Inputs are stripped before lookup, so "9 AM to 5 PM" and " 9 AM to 5 PM " share one cache entry.
+    Every invalid row gets its own ValueError, even when its input is cached.
+    """
+    for s in strings:
+        try:
+            result, message = _convert_cached(s.strip())
+        # e.g. None or a number from a spreadsheet column:
+        except (AttributeError, TypeError):
+            result, message = None, f"invalid time range: {s!r}"
+        yield result, None if message is None else ValueError(message)
+
+
 if __name__ == "__main__":
     main()